@@ -4,8 +4,6 @@ import json
 import os
 from pathlib import Path
 
-import httpx
-
 from .compiler import compile_program
 from .parser import (
     ClassifyDef,
@@ -20,7 +18,9 @@ from .parser import (
 from .runtime import (
     _DEFAULT_MODEL,
     _draft_llm,
+    _make_client,
     _make_llm_extractor,
+    _make_route,
     _row_to_text,
     run,
 )
@@ -175,6 +175,27 @@ class Pipeline:
             self._settings.seed = int(kwargs["seed"])  # type: ignore[arg-type]
         if "headers" in kwargs:
             self._settings.headers = kwargs["headers"]  # type: ignore[assignment]
+        if "fuse_draft" in kwargs:
+            self._settings.fuse_draft = bool(kwargs["fuse_draft"])
+        if "prompt_cache" in kwargs:
+            self._settings.prompt_cache = bool(kwargs["prompt_cache"])
+        if "max_concurrency" in kwargs:
+            self._settings.max_concurrency = int(kwargs["max_concurrency"])  # type: ignore[arg-type]
+        if "batch_size" in kwargs:
+            self._settings.batch_size = int(kwargs["batch_size"])  # type: ignore[arg-type]
+        if "max_connections" in kwargs:
+            self._settings.max_connections = int(kwargs["max_connections"])  # type: ignore[arg-type]
+        if "max_keepalive" in kwargs:
+            self._settings.max_keepalive = int(kwargs["max_keepalive"])  # type: ignore[arg-type]
+        if "endpoints" in kwargs:
+            # [(url, token_env), ...] — tokens always come from env vars
+            self._settings.endpoints = [tuple(e) for e in kwargs["endpoints"]]  # type: ignore[union-attr]
+        if "max_retries" in kwargs:
+            self._settings.max_retries = int(kwargs["max_retries"])  # type: ignore[arg-type]
+        if "timeout" in kwargs:
+            self._settings.timeout = float(kwargs["timeout"])  # type: ignore[arg-type]
+        if "prewarm" in kwargs:
+            self._settings.prewarm = bool(kwargs["prewarm"])
         return self
 
     def output(self, path: str) -> Pipeline:
@@ -227,17 +248,12 @@ class Pipeline:
 
 def _run_single(plan, text: str) -> dict:
     """Process one record through the pipeline without file I/O."""
-    token = os.environ.get("GITHUB_TOKEN", "")
     model = plan.settings.model or os.environ.get("AIDSL_MODEL", _DEFAULT_MODEL)
 
-    client = httpx.Client(timeout=30.0)
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-        "Content-Type": "application/json",
-    }
+    client = _make_client(plan.settings)
+    route = _make_route(plan.settings)
 
-    extractor = _make_llm_extractor(client, headers, model)
+    extractor = _make_llm_extractor(client, route, model)
 
     # Convert text to row dict for _row_to_text compatibility
     try:
@@ -255,7 +271,7 @@ def _run_single(plan, text: str) -> dict:
 
     # DRAFT step
     if plan.draft_prompt:
-        draft_text, resolved_prompt = _draft_llm(client, headers, model, plan, record)
+        draft_text, resolved_prompt = _draft_llm(client, route, model, plan, record)
         if draft_text:
             record[plan.draft_prompt.field_name] = draft_text
             record["_draft_prompt"] = resolved_prompt
@@ -1,61 +1,122 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import functools
+import operator
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Literal
+from typing import Annotated, Any, Literal
 
 import pydantic
+from typing_extensions import TypedDict  # pydantic rejects typing's before 3.12
 
 from .parser import Condition, DraftDef, FieldDef, FlagRule, Program, Schema, Settings
 
 
-@dataclass
+@dataclass(slots=True)
 class ExtractionPrompt:
     system: str
     json_schema: dict
+    validator: Callable[[Any], dict] | None = None  # compiled from the schema
+    batch_validator: Callable[[Any], list[dict]] | None = None  # list of records
 
 
-@dataclass
-class FlagEvaluator:
-    rules: list[FlagRule]
+# Closing line of every extraction prompt; a batched call swaps it for an array
+_RETURN_OBJECT = "Return ONLY a valid JSON object"
 
-    def evaluate(self, record: dict) -> list[str]:
-        reasons = []
-        for rule in self.rules:
-            if self._eval_rule(rule, record):
-                reasons.append(self._describe(rule))
-        return reasons
-
-    def _eval_rule(self, rule: FlagRule, record: dict) -> bool:
-        if not rule.conditions:
-            return False
-        results = [self._eval_cond(c, record) for c in rule.conditions]
-        result = results[0]
-        for i, conj in enumerate(rule.conjunctions):
-            if i + 1 < len(results):
-                if conj == "AND":
-                    result = result and results[i + 1]
-                else:
-                    result = result or results[i + 1]
-        return result
-
-    def _eval_cond(self, cond: Condition, record: dict) -> bool:
-        value = record.get(cond.field)
-        if value is None:
-            return False
-        if cond.op == "OVER":
-            try:
-                return float(value) > float(cond.value)
-            except (ValueError, TypeError):
+_Predicate = Callable[[dict, dict], bool]
+
+
+def _compile_condition(cond: Condition) -> _Predicate:
+    """Specialize a Condition into a predicate over a record dict.
+
+    The op dispatch and threshold parsing happen here once, and the
+    pre-lowered IS value is bound as a default argument, so each
+    evaluation is a dict lookup and a compare. Predicates also take a
+    per-record cache of lowered field values, shared by every IS check
+    in one evaluate() call.
+    """
+    if cond.op == "IS":
+
+        def _is(record: dict, lc: dict, f: str = cond.field, v: str = cond.value_lc):
+            value = lc.get(f)
+            if value is None:
+                raw = record.get(f)
+                if raw is None:
+                    return False
+                value = lc[f] = str(raw).lower()
+            return value == v
+
+        return _is
+
+    if cond.op in ("OVER", "UNDER"):
+        try:
+            threshold = float(cond.value)
+        except ValueError:
+            return lambda record, lc: False
+        compare = operator.gt if cond.op == "OVER" else operator.lt
+
+        def _cmp(record: dict, lc: dict, f: str = cond.field, t: float = threshold):
+            value = record.get(f)
+            if value is None:
                 return False
-        elif cond.op == "UNDER":
             try:
-                return float(value) < float(cond.value)
+                return compare(float(value), t)
             except (ValueError, TypeError):
                 return False
-        elif cond.op == "IS":
-            return str(value).lower() == cond.value.lower()
-        return False
+
+        return _cmp
+
+    return lambda record, lc: False
+
+
+def _compile_rule(rule: FlagRule) -> _Predicate:
+    """Compose a FlagRule into a single short-circuiting predicate.
+
+    Conditions fold left to right as the rule reads — A AND B OR C is
+    (A AND B) OR C — and Python's and/or skip conditions that can't
+    change the result.
+    """
+    predicates = [_compile_condition(c) for c in rule.conditions]
+    if not predicates:
+        return lambda record, lc: False
+    matches = predicates[0]
+    for conj, predicate in zip(rule.conjunctions, predicates[1:]):
+        if conj == "AND":
+            matches = _all_of(matches, predicate)
+        else:
+            matches = _any_of(matches, predicate)
+    return matches
+
+
+def _all_of(a: _Predicate, b: _Predicate):
+    return lambda record, lc: a(record, lc) and b(record, lc)
+
+
+def _any_of(a: _Predicate, b: _Predicate):
+    return lambda record, lc: a(record, lc) or b(record, lc)
+
+
+@dataclass(slots=True)
+class FlagEvaluator:
+    rules: list[FlagRule]
+    _predicates: list[_Predicate] = field(init=False, repr=False, compare=False)
+    _reasons: list[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # One compiled predicate and one reason string per rule;
+        # evaluate() does no interpretation or formatting
+        self._predicates = [_compile_rule(rule) for rule in self.rules]
+        self._reasons = [self._describe(rule) for rule in self.rules]
+
+    def evaluate(self, record: dict) -> list[str]:
+        lc: dict[str, str] = {}  # field -> lowered value, filled by IS checks
+        return [
+            reason
+            for reason, matches in zip(self._reasons, self._predicates)
+            if matches(record, lc)
+        ]
 
     def _describe(self, rule: FlagRule) -> str:
         parts = []
@@ -66,13 +127,14 @@ class FlagEvaluator:
         return " ".join(parts)
 
 
-@dataclass
+@dataclass(slots=True)
 class DraftPrompt:
     system: str  # prompt template (may contain {field} placeholders)
     field_name: str  # output field name for the generated text
+    fused: bool = False  # generated by the extraction call (SET FUSE_DRAFT)
 
 
-@dataclass
+@dataclass(slots=True)
 class ExecutionPlan:
     source: str
     extraction_prompt: ExtractionPrompt
@@ -85,6 +147,36 @@ class ExecutionPlan:
     pydantic_model: type[pydantic.BaseModel] | None = None
 
 
+def _field_annotation(
+    f: FieldDef,
+    all_schemas: dict[str, Schema],
+    build_nested: Callable[[Schema], Any],
+) -> Any:
+    """Map a FieldDef to the Python type Pydantic validates it against.
+
+    LIST OF and REF fields resolve their referenced schema and hand it to
+    build_nested, so the same mapping serves models and typed dicts.
+    """
+    if f.type == "TEXT":
+        return str
+    elif f.type in ("MONEY", "NUMBER"):
+        return float
+    elif f.type == "BOOL":
+        return bool
+    elif f.type == "ENUM":
+        return Literal[tuple(f.enum_values)]  # type: ignore[valid-type]
+    elif f.type in ("LIST", "REF"):
+        ref_schema = all_schemas.get(f.ref_type)
+        if not ref_schema:
+            raise ValueError(f"Referenced type '{f.ref_type}' not defined")
+        nested = build_nested(ref_schema)
+        if f.type == "REF":
+            return nested
+        # Stop at the first bad item — callers only need pass/fail
+        return Annotated[list[nested], pydantic.FailFast()]  # type: ignore[valid-type]
+    return str
+
+
 def _build_pydantic_model(
     schema: Schema,
     all_schemas: dict[str, Schema],
@@ -96,32 +188,15 @@ def _build_pydantic_model(
     Nested schemas are recursively converted to nested Pydantic models.
     """
     model_name = name or schema.name.capitalize()
-    field_definitions: dict[str, Any] = {}
-
-    for f in schema.fields:
-        if f.type == "TEXT":
-            field_definitions[f.name] = (str, ...)
-        elif f.type in ("MONEY", "NUMBER"):
-            field_definitions[f.name] = (float, ...)
-        elif f.type == "BOOL":
-            field_definitions[f.name] = (bool, ...)
-        elif f.type == "ENUM":
-            literal_type = Literal[tuple(f.enum_values)]  # type: ignore[valid-type]
-            field_definitions[f.name] = (literal_type, ...)
-        elif f.type == "LIST":
-            ref_schema = all_schemas.get(f.ref_type)
-            if not ref_schema:
-                raise ValueError(f"Referenced type '{f.ref_type}' not defined")
-            item_model = _build_pydantic_model(ref_schema, all_schemas)
-            field_definitions[f.name] = (list[item_model], ...)  # type: ignore[valid-type]
-        elif f.type == "REF":
-            ref_schema = all_schemas.get(f.ref_type)
-            if not ref_schema:
-                raise ValueError(f"Referenced type '{f.ref_type}' not defined")
-            nested_model = _build_pydantic_model(ref_schema, all_schemas)
-            field_definitions[f.name] = (nested_model, ...)
-        else:
-            field_definitions[f.name] = (str, ...)
+    field_definitions: dict[str, Any] = {
+        f.name: (
+            _field_annotation(
+                f, all_schemas, lambda s: _build_pydantic_model(s, all_schemas)
+            ),
+            ...,
+        )
+        for f in schema.fields
+    }
 
     return pydantic.create_model(
         model_name,
@@ -130,14 +205,99 @@ def _build_pydantic_model(
     )
 
 
+def _build_record_type(schema: Schema, all_schemas: dict[str, Schema]) -> type:
+    """Build a TypedDict mirroring the Pydantic model for the same Schema."""
+    return TypedDict(  # type: ignore[operator]
+        schema.name.capitalize(),
+        {
+            f.name: _field_annotation(
+                f, all_schemas, lambda s: _build_record_type(s, all_schemas)
+            )
+            for f in schema.fields
+        },
+    )
+
+
+def _build_validators(
+    schema: Schema, all_schemas: dict[str, Schema]
+) -> tuple[Callable[[Any], dict], Callable[[Any], list[dict]]]:
+    """Compile the record and record-list validators once per plan.
+
+    Validating into a TypedDict runs entirely in pydantic-core and returns
+    plain dicts with coerced values, so no model instance is built and no
+    model_dump() round-trip is needed per record. The list form checks a
+    whole batch in a single call.
+    """
+    record_type = _build_record_type(schema, all_schemas)
+    one = pydantic.TypeAdapter(record_type)
+    many = pydantic.TypeAdapter(
+        Annotated[list[record_type], pydantic.FailFast()]  # type: ignore[valid-type]
+    )
+    return one.validate_python, many.validate_python
+
+
+def _schema_key(schema: Schema, all_schemas: dict[str, Schema]) -> tuple:
+    """A hashable snapshot of a schema and every schema it could reference."""
+    schemas = {**all_schemas, schema.name: schema}
+    return (
+        schema.name,
+        tuple(
+            (
+                name,
+                tuple(
+                    (f.name, f.type, tuple(f.enum_values), f.ref_type) for f in s.fields
+                ),
+            )
+            for name, s in sorted(schemas.items())
+        ),
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_schema(
+    key: tuple,
+) -> tuple[
+    Callable[[Any], dict], Callable[[Any], list[dict]], type[pydantic.BaseModel]
+]:
+    """Build validators and the Pydantic model once per distinct schema.
+
+    Building them dominates compile time, and they depend only on the
+    schema definitions, so plans compiled from the same schemas (the same
+    .ai file compiled again, or sibling files sharing a DEFINE) reuse them.
+    The results are stateless and safe to share between plans.
+    """
+    name, definitions = key
+    all_schemas = {
+        schema_name: Schema(
+            schema_name,
+            [FieldDef(f, t, list(enum), ref) for f, t, enum, ref in fields],
+        )
+        for schema_name, fields in definitions
+    }
+    schema = all_schemas[name]
+    validator, batch_validator = _build_validators(schema, all_schemas)
+    return validator, batch_validator, _build_pydantic_model(schema, all_schemas)
+
+
 def compile_program(program: Program, base_dir: str = ".") -> ExecutionPlan:
+    draft_prompt = _compile_draft(program.draft, base_dir) if program.draft else None
+    fused = None
+    if (
+        draft_prompt
+        and program.settings.fuse_draft
+        and _can_fuse_draft(program.draft, draft_prompt, _output_fields(program))
+    ):
+        fused = program.draft
+
     if program.classify:
-        plan = _compile_classify(program, base_dir)
+        plan = _compile_classify(program, base_dir, fused)
     else:
-        plan = _compile_extract(program, base_dir)
+        plan = _compile_extract(program, base_dir, fused)
 
-    if program.draft:
-        plan.draft_prompt = _compile_draft(program.draft, base_dir)
+    if draft_prompt:
+        plan.draft_prompt = draft_prompt
+        if fused:
+            _fuse_draft(plan, fused)
 
     plan.settings = program.settings
 
@@ -152,7 +312,14 @@ def _load_prompt_file(name: str, base_dir: str) -> str:
             f"Prompt file not found: {prompt_path}\n"
             f"  Create prompts/{name}.prompt alongside your .ai file"
         )
-    return prompt_path.read_text(encoding="utf-8").strip()
+    st = prompt_path.stat()
+    return _read_prompt(str(prompt_path.resolve()), st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=256)
+def _read_prompt(path: str, mtime_ns: int, size: int) -> str:
+    # Keyed on mtime and size, so an edited file is read again
+    return Path(path).read_text(encoding="utf-8").strip()
 
 
 def _load_examples_file(name: str, base_dir: str) -> list[tuple[str, str]]:
@@ -173,7 +340,15 @@ def _load_examples_file(name: str, base_dir: str) -> list[tuple[str, str]]:
             f"Examples file not found: {examples_path}\n"
             f"  Create examples/{name}.examples alongside your .ai file"
         )
-    text = examples_path.read_text(encoding="utf-8").strip()
+    st = examples_path.stat()
+    return list(
+        _read_examples(str(examples_path.resolve()), st.st_mtime_ns, st.st_size)
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _read_examples(path: str, mtime_ns: int, size: int) -> tuple[tuple[str, str], ...]:
+    text = Path(path).read_text(encoding="utf-8").strip()
     pairs: list[tuple[str, str]] = []
     current_input = ""
     current_output = ""
@@ -193,7 +368,7 @@ def _load_examples_file(name: str, base_dir: str) -> list[tuple[str, str]]:
     if current_input and current_output:
         pairs.append((current_input.strip(), current_output.strip()))
 
-    return pairs
+    return tuple(pairs)
 
 
 def _format_examples(pairs: list[tuple[str, str]]) -> str:
@@ -286,7 +461,9 @@ def _field_to_prompt_desc(f: FieldDef, all_schemas: dict[str, Schema]) -> str:
     return f"- {f.name}: text string"
 
 
-def _compile_extract(program: Program, base_dir: str) -> ExecutionPlan:
+def _compile_extract(
+    program: Program, base_dir: str, fused: DraftDef | None = None
+) -> ExecutionPlan:
     schema = program.schemas.get(program.extract_target)
     if not schema:
         raise ValueError(f"Schema '{program.extract_target}' not defined")
@@ -310,6 +487,8 @@ def _compile_extract(program: Program, base_dir: str) -> ExecutionPlan:
 
     for f in schema.fields:
         prompt_lines.append(_field_to_prompt_desc(f, program.schemas))
+    if fused:
+        prompt_lines.append(_draft_field_desc(fused))
 
     # Append few-shot examples if EXAMPLES provided
     if program.examples_name:
@@ -318,31 +497,38 @@ def _compile_extract(program: Program, base_dir: str) -> ExecutionPlan:
             prompt_lines.append("")
             prompt_lines.append(_format_examples(pairs))
 
-    prompt_lines.append(
-        "\nReturn ONLY a valid JSON object. No markdown, no explanation."
-    )
+    if fused:
+        prompt_lines.extend(_draft_instructions(fused, base_dir))
+    prompt_lines.append(f"\n{_RETURN_OBJECT}. No markdown, no explanation.")
 
     json_schema = {
         "type": "object",
         "properties": json_properties,
         "required": required,
     }
+    validator, batch_validator, pydantic_model = _compile_schema(
+        _schema_key(schema, program.schemas)
+    )
 
     return ExecutionPlan(
         source=program.source,
         extraction_prompt=ExtractionPrompt(
             system="\n".join(prompt_lines),
             json_schema=json_schema,
+            validator=validator,
+            batch_validator=batch_validator,
         ),
         flag_evaluator=FlagEvaluator(rules=program.flags),
         output=program.output,
         schema=schema,
         verb="EXTRACT",
-        pydantic_model=_build_pydantic_model(schema, program.schemas),
+        pydantic_model=pydantic_model,
     )
 
 
-def _compile_classify(program: Program, base_dir: str) -> ExecutionPlan:
+def _compile_classify(
+    program: Program, base_dir: str, fused: DraftDef | None = None
+) -> ExecutionPlan:
     classify = program.classify
     values_str = ", ".join(classify.categories)
 
@@ -359,10 +545,22 @@ def _compile_classify(program: Program, base_dir: str) -> ExecutionPlan:
             "Classify the input text into exactly one category.",
             f"Categories: {values_str}",
             "",
-            f'Return a JSON object with one field "{classify.field_name}" '
-            f"whose value is exactly one of: {values_str}",
         ]
     )
+    if fused:
+        prompt_lines.extend(
+            [
+                "Return a JSON object with EXACTLY these fields:",
+                "",
+                f"- {classify.field_name}: MUST be exactly one of: {values_str}",
+                _draft_field_desc(fused),
+            ]
+        )
+    else:
+        prompt_lines.append(
+            f'Return a JSON object with one field "{classify.field_name}" '
+            f"whose value is exactly one of: {values_str}"
+        )
 
     # Append few-shot examples if EXAMPLES provided
     if program.examples_name:
@@ -371,10 +569,12 @@ def _compile_classify(program: Program, base_dir: str) -> ExecutionPlan:
             prompt_lines.append("")
             prompt_lines.append(_format_examples(pairs))
 
+    if fused:
+        prompt_lines.extend(_draft_instructions(fused, base_dir))
     prompt_lines.extend(
         [
             "",
-            "Return ONLY a valid JSON object. No markdown, no explanation.",
+            f"{_RETURN_OBJECT}. No markdown, no explanation.",
         ]
     )
 
@@ -394,18 +594,23 @@ def _compile_classify(program: Program, base_dir: str) -> ExecutionPlan:
         name="_classify",
         fields=[FieldDef(classify.field_name, "ENUM", classify.categories)],
     )
+    validator, batch_validator, pydantic_model = _compile_schema(
+        _schema_key(schema, program.schemas)
+    )
 
     return ExecutionPlan(
         source=program.source,
         extraction_prompt=ExtractionPrompt(
             system="\n".join(prompt_lines),
             json_schema=json_schema,
+            validator=validator,
+            batch_validator=batch_validator,
         ),
         flag_evaluator=FlagEvaluator(rules=program.flags),
         output=program.output,
         schema=schema,
         verb="CLASSIFY",
-        pydantic_model=_build_pydantic_model(schema, program.schemas),
+        pydantic_model=pydantic_model,
     )
 
 
@@ -437,3 +642,66 @@ def _compile_draft(draft: DraftDef, base_dir: str) -> DraftPrompt:
         system="\n".join(prompt_lines),
         field_name=draft.field_name,
     )
+
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def _output_fields(program: Program) -> set[str]:
+    """Names of the fields the extraction call returns."""
+    if program.classify:
+        return {program.classify.field_name}
+    schema = program.schemas.get(program.extract_target)
+    return {f.name for f in schema.fields} if schema else set()
+
+
+def _can_fuse_draft(
+    draft: DraftDef, draft_prompt: DraftPrompt, field_names: set[str]
+) -> bool:
+    """A DRAFT can ride along with extraction only if it needs nothing from it.
+
+    {field} placeholders are filled from the extracted record, and draft
+    examples show record -> text pairs, so either forces a second call.
+    """
+    if draft.examples_name:
+        return False
+    used = set(_PLACEHOLDER_RE.findall(draft_prompt.system))
+    return not (used & field_names)
+
+
+def _draft_field_desc(draft: DraftDef) -> str:
+    """Field-list line for a DRAFT folded into the extraction call."""
+    desc = f"- {draft.field_name}: text generated from the input"
+    if draft.prompt_name:
+        desc += ", following the instructions below"
+    return desc
+
+
+def _draft_instructions(draft: DraftDef, base_dir: str) -> list[str]:
+    """The DRAFT's PROMPT template, placed after the field list when fused."""
+    if not draft.prompt_name:
+        return []
+    return [
+        "",
+        f'Instructions for "{draft.field_name}":',
+        _load_prompt_file(draft.prompt_name, base_dir),
+    ]
+
+
+def _fuse_draft(plan: ExecutionPlan, draft: DraftDef) -> None:
+    """Add the DRAFT field to a plan whose prompt was built with it.
+
+    One request returns both the extracted fields and the generated text,
+    halving round-trips per record. The validator is unchanged — the draft
+    field is free text and passes through on the record.
+    """
+    json_schema = plan.extraction_prompt.json_schema
+    plan.extraction_prompt.json_schema = {
+        **json_schema,
+        "properties": {
+            **json_schema["properties"],
+            draft.field_name: {"type": "string"},
+        },
+        "required": [*json_schema["required"], draft.field_name],
+    }
+    plan.draft_prompt.fused = True
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import functools
+import itertools
+import os
 import re
+from collections.abc import Callable
 from dataclasses import dataclass, field
 
 
-@dataclass
+# Schema fields and flag rules are read on every compile and evaluate: slotted.
+# frozen only stops attribute rebinding; list fields such as enum_values stay
+# mutable, and each parse() call builds its own instances anyway.
+@dataclass(frozen=True, slots=True)
 class FieldDef:
     name: str
     type: str  # TEXT, MONEY, NUMBER, BOOL, ENUM, LIST, REF
@@ -18,14 +25,19 @@ class Schema:
     fields: list[FieldDef] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Condition:
     field: str
     op: str  # OVER, UNDER, IS
     value: str
+    value_lc: str = field(init=False, repr=False, compare=False)
 
+    def __post_init__(self) -> None:
+        # IS compares case-insensitively; lowercase the rule side once
+        object.__setattr__(self, "value_lc", self.value.lower())
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class FlagRule:
     conditions: list[Condition] = field(default_factory=list)
     conjunctions: list[str] = field(default_factory=list)
@@ -44,13 +56,24 @@ class DraftDef:
     examples_name: str = ""  # EXAMPLES <name> — .examples file
 
 
-@dataclass
+@dataclass(slots=True)
 class Settings:
     model: str = ""
     temperature: float | None = None
     top_p: float | None = None
     seed: int | None = None
     headers: dict[str, str] = field(default_factory=dict)
+    fuse_draft: bool = False  # SET FUSE_DRAFT on — one LLM call for EXTRACT + DRAFT
+    max_concurrency: int = 1  # SET MAX_CONCURRENCY n — rows in flight at once
+    batch_size: int = 1  # SET BATCH_SIZE k — rows sent per LLM call
+    prompt_cache: bool = False  # SET PROMPT_CACHE on — send prompt_cache_key
+    max_connections: int | None = None  # LLM pool size; concurrency × endpoints
+    max_keepalive: int | None = None  # idle connections kept warm; same default
+    timeout: float = 30.0  # seconds per LLM request (connect is capped at 10)
+    max_retries: int = 2  # SET MAX_RETRIES n — extra attempts per LLM call
+    prewarm: bool = True  # SET PREWARM off — skip the TLS warm-up before row 1
+    # SET ENDPOINT <url> [TOKEN_ENV] — repeatable; requests round-robin over them
+    endpoints: list[tuple[str, str]] = field(default_factory=list)
 
 
 @dataclass
@@ -68,8 +91,25 @@ class Program:
 
 
 def parse(filepath: str) -> Program:
+    """Parse a .ai file, rereading it from disk only when it has changed.
+
+    Only the source text is cached. Every call returns a freshly parsed
+    Program, so callers can change its settings or flags without affecting
+    anyone else.
+    """
+    st = os.stat(filepath)
+    return parse_string(_read_source(os.fspath(filepath), st.st_mtime_ns, st.st_size))
+
+
+@functools.lru_cache(maxsize=128)
+def _read_source(filepath: str, mtime_ns: int, size: int) -> str:
     with open(filepath) as f:
-        lines = f.readlines()
+        return f.read()
+
+
+def parse_string(text: str) -> Program:
+    """Parse .ai source text into a Program."""
+    lines = text.splitlines()
 
     program = Program()
     current_schema: Schema | None = None
@@ -98,14 +138,10 @@ def parse(filepath: str) -> Program:
             parts = stripped.split(None, 1)
             if len(parts) == 2:
                 field_name, type_str = parts
-                if type_str == "TEXT":
-                    current_schema.fields.append(FieldDef(field_name, "TEXT"))
-                elif type_str == "MONEY":
-                    current_schema.fields.append(FieldDef(field_name, "MONEY"))
-                elif type_str == "NUMBER":
-                    current_schema.fields.append(FieldDef(field_name, "NUMBER"))
-                elif type_str == "YES/NO":
-                    current_schema.fields.append(FieldDef(field_name, "BOOL"))
+                if type_str in _SCALAR_TYPES:
+                    current_schema.fields.append(
+                        FieldDef(field_name, _SCALAR_TYPES[type_str])
+                    )
                 elif type_str.startswith("ONE OF"):
                     enum_match = re.search(r"\[([^\]]+)\]", type_str)
                     if enum_match:
@@ -129,55 +165,10 @@ def parse(filepath: str) -> Program:
         # Non-indented line ends any schema block
         current_schema = None
 
-        if stripped.startswith("FROM "):
-            program.source = stripped[5:].strip()
-        elif stripped.startswith("EXTRACT "):
-            target, with_name, use_name = _split_modifiers(stripped[8:])
-            program.extract_target = target
-            if with_name:
-                program.prompt_name = with_name
-            if use_name:
-                program.examples_name = use_name
-        elif stripped.startswith("CLASSIFY "):
-            program.classify = _parse_classify(stripped)
-            # Check for PROMPT and EXAMPLES on the CLASSIFY line
-            prompt_match = re.search(r"\bPROMPT\s+(\w+)", stripped)
-            if prompt_match:
-                program.prompt_name = prompt_match.group(1)
-            examples_match = re.search(r"\bEXAMPLES\s+(\w+)", stripped)
-            if examples_match:
-                program.examples_name = examples_match.group(1)
-        elif stripped.startswith("DRAFT "):
-            target, with_name, use_name = _split_modifiers(stripped[6:])
-            program.draft = DraftDef(
-                field_name=target,
-                prompt_name=with_name,
-                examples_name=use_name,
-            )
-        elif stripped.startswith("PROMPT "):
-            rest = stripped[7:].strip()
-            # Handle "PROMPT ctx EXAMPLES ex" on one line
-            examples_in_prompt = re.search(r"\bEXAMPLES\s+(\w+)", rest)
-            if examples_in_prompt:
-                program.examples_name = examples_in_prompt.group(1)
-                program.prompt_name = rest[: examples_in_prompt.start()].strip()
-            else:
-                program.prompt_name = rest
-        elif stripped.startswith("EXAMPLES "):
-            rest = stripped[9:].strip()
-            # Handle "EXAMPLES ex PROMPT ctx" on one line
-            prompt_in_examples = re.search(r"\bPROMPT\s+(\w+)", rest)
-            if prompt_in_examples:
-                program.prompt_name = prompt_in_examples.group(1)
-                program.examples_name = rest[: prompt_in_examples.start()].strip()
-            else:
-                program.examples_name = rest
-        elif stripped.startswith("SET "):
-            _parse_set(stripped[4:], program.settings)
-        elif stripped.startswith("FLAG WHEN "):
-            program.flags.append(_parse_flag_rule(stripped[10:]))
-        elif stripped.startswith("OUTPUT "):
-            program.output = stripped[7:].strip()
+        keyword, _, rest = stripped.partition(" ")
+        handler = _STATEMENTS.get(keyword)
+        if handler is not None and rest:
+            handler(program, rest, stripped)
 
         i += 1
 
@@ -191,23 +182,32 @@ def _split_modifiers(text: str) -> tuple[str, str, str]:
     Returns (target, prompt_name, examples_name).
     """
     text = text.strip()
+    words = text.split()
+    with_name, use_name = _modifiers(words)
 
-    with_name = ""
-    use_name = ""
+    # Target is the first word before any modifier keyword
+    target_match = _WORD_RE.match(text)
+    target = target_match.group() if target_match else text
 
-    with_match = re.search(r"\bPROMPT\s+(\w+)", text)
-    if with_match:
-        with_name = with_match.group(1)
+    return target, with_name, use_name
 
-    use_match = re.search(r"\bEXAMPLES\s+(\w+)", text)
-    if use_match:
-        use_name = use_match.group(1)
 
-    # Target is the first word before any modifier keyword
-    target_match = re.match(r"(\w+)", text)
-    target = target_match.group(1) if target_match else text
+_WORD_RE = re.compile(r"\w+")
 
-    return target, with_name, use_name
+
+def _modifiers(words: list[str]) -> tuple[str, str]:
+    """Find the names after PROMPT and EXAMPLES in one pass over a line.
+
+    Returns (prompt_name, examples_name); "" where a modifier is absent.
+    The first occurrence of each keyword wins.
+    """
+    found = {"PROMPT": "", "EXAMPLES": ""}
+    for word, name in itertools.pairwise(words):
+        if found.get(word) == "":
+            match = _WORD_RE.match(name)
+            if match:
+                found[word] = match.group()
+    return found["PROMPT"], found["EXAMPLES"]
 
 
 def _parse_classify(text: str) -> ClassifyDef:
@@ -242,6 +242,28 @@ def _parse_set(text: str, settings: Settings) -> None:
         settings.top_p = float(value)
     elif key == "SEED":
         settings.seed = int(value)
+    elif key == "FUSE_DRAFT":
+        settings.fuse_draft = value.lower() in ("on", "true", "yes", "1")
+    elif key == "PROMPT_CACHE":
+        settings.prompt_cache = value.lower() in ("on", "true", "yes", "1")
+    elif key == "MAX_CONCURRENCY":
+        settings.max_concurrency = int(value)
+    elif key == "BATCH_SIZE":
+        settings.batch_size = int(value)
+    elif key == "MAX_CONNECTIONS":
+        settings.max_connections = int(value)
+    elif key == "MAX_KEEPALIVE":
+        settings.max_keepalive = int(value)
+    elif key == "MAX_RETRIES":
+        settings.max_retries = int(value)
+    elif key == "TIMEOUT":
+        settings.timeout = float(value)
+    elif key == "PREWARM":
+        settings.prewarm = value.lower() in ("on", "true", "yes", "1")
+    elif key == "ENDPOINT":
+        # SET ENDPOINT https://host/v1/chat/completions AZURE_OPENAI_TOKEN
+        url, _, token_env = value.partition(" ")
+        settings.endpoints.append((url, token_env.strip() or "GITHUB_TOKEN"))
     elif key == "HEADER":
         # SET HEADER Authorization Bearer token123
         header_parts = value.split(None, 1)
@@ -267,3 +289,81 @@ def _parse_flag_rule(text: str) -> FlagRule:
             )
 
     return FlagRule(conditions=conditions, conjunctions=conjunctions)
+
+
+# DSL spelling -> FieldDef.type for types that take no arguments
+_SCALAR_TYPES = {
+    "TEXT": "TEXT",
+    "MONEY": "MONEY",
+    "NUMBER": "NUMBER",
+    "YES/NO": "BOOL",
+}
+
+
+# ---------------------------------------------------------------------------
+# Top-level statements — dispatched on the first word of the line. Each
+# handler gets the text after the keyword and the whole stripped line.
+# ---------------------------------------------------------------------------
+
+
+def _stmt_from(program: Program, rest: str, line: str) -> None:
+    program.source = rest.strip()
+
+
+def _stmt_extract(program: Program, rest: str, line: str) -> None:
+    target, with_name, use_name = _split_modifiers(rest)
+    program.extract_target = target
+    if with_name:
+        program.prompt_name = with_name
+    if use_name:
+        program.examples_name = use_name
+
+
+def _stmt_classify(program: Program, rest: str, line: str) -> None:
+    program.classify = _parse_classify(line)
+    # PROMPT and EXAMPLES may follow the category list
+    _stmt_modifiers(program, rest, line)
+
+
+def _stmt_draft(program: Program, rest: str, line: str) -> None:
+    target, with_name, use_name = _split_modifiers(rest)
+    program.draft = DraftDef(
+        field_name=target,
+        prompt_name=with_name,
+        examples_name=use_name,
+    )
+
+
+def _stmt_modifiers(program: Program, rest: str, line: str) -> None:
+    # Standalone "PROMPT ctx EXAMPLES ex" / "EXAMPLES ex PROMPT ctx"
+    prompt_name, examples_name = _modifiers(line.split())
+    if prompt_name:
+        program.prompt_name = prompt_name
+    if examples_name:
+        program.examples_name = examples_name
+
+
+def _stmt_set(program: Program, rest: str, line: str) -> None:
+    _parse_set(rest, program.settings)
+
+
+def _stmt_flag(program: Program, rest: str, line: str) -> None:
+    if rest.startswith("WHEN "):
+        program.flags.append(_parse_flag_rule(rest[5:]))
+
+
+def _stmt_output(program: Program, rest: str, line: str) -> None:
+    program.output = rest.strip()
+
+
+_STATEMENTS: dict[str, Callable[[Program, str, str], None]] = {
+    "FROM": _stmt_from,
+    "EXTRACT": _stmt_extract,
+    "CLASSIFY": _stmt_classify,
+    "DRAFT": _stmt_draft,
+    "PROMPT": _stmt_modifiers,
+    "EXAMPLES": _stmt_modifiers,
+    "SET": _stmt_set,
+    "FLAG": _stmt_flag,
+    "OUTPUT": _stmt_output,
+}
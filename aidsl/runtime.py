@@ -1,27 +1,47 @@
 from __future__ import annotations
 
+import contextlib
 import csv
+import functools
+import hashlib
+import itertools
 import json
 import os
+import random
+import re
 import sys
 import time
+from collections.abc import Callable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import MappingProxyType
 
 import httpx
+import pydantic
 
-from .compiler import ExecutionPlan
+try:
+    import orjson
+except ImportError:  # optional speedup: pip install aidsl[fast]
+    orjson = None
+
+from .compiler import _RETURN_OBJECT, ExecutionPlan
+from .parser import Settings
 
 # GitHub Models inference endpoint (OpenAI chat completions compatible)
-_GITHUB_MODELS_URL = "https://models.github.ai/inference/chat/completions"
+_GITHUB_MODELS_ORIGIN = "https://models.github.ai"
+_GITHUB_MODELS_URL = f"{_GITHUB_MODELS_ORIGIN}/inference/chat/completions"
 _DEFAULT_MODEL = "openai/gpt-4.1-mini"
 
 
 def run(plan: ExecutionPlan, base_dir: str = ".") -> list[dict]:
-    token = os.environ.get("GITHUB_TOKEN", "")
     model = plan.settings.model or os.environ.get("AIDSL_MODEL", _DEFAULT_MODEL)
-    if not token:
-        print("  ERROR: Set GITHUB_TOKEN env var (GitHub PAT with models:read)")
-        sys.exit(1)
+    for _, token_env in _endpoints(plan.settings):
+        if not os.environ.get(token_env, ""):
+            if token_env == "GITHUB_TOKEN":
+                print("  ERROR: Set GITHUB_TOKEN env var (GitHub PAT with models:read)")
+            else:
+                print(f"  ERROR: Set {token_env} env var (token for SET ENDPOINT)")
+            sys.exit(1)
 
     # Handle API sources (https://) vs file sources
     if plan.source.startswith("https://"):
@@ -40,63 +60,89 @@ def run(plan: ExecutionPlan, base_dir: str = ".") -> list[dict]:
     print(f"  FLAGS: {len(plan.flag_evaluator.rules)} rules")
     print(f"  MODEL: {model}\n")
 
-    client = httpx.Client(timeout=30.0)
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-        "Content-Type": "application/json",
-    }
-    extractor = _make_llm_extractor(client, headers, model)
+    workers = max(1, plan.settings.max_concurrency)
+    client = _make_client(plan.settings)
+    if plan.settings.prewarm:
+        for url, _ in _endpoints(plan.settings):
+            _prewarm(client, _origin(url))
+    route = _make_route(plan.settings)
+    extractor = _make_llm_extractor(client, route, model)
+    batch_extractor = _make_batch_extractor(client, route, model)
     results = []
 
-    for i, row in enumerate(rows):
-        text = _row_to_text(row)
-        if not text:
-            continue
+    work = [(i, row, text) for i, row in enumerate(rows) if (text := _row_to_text(row))]
+    # SET BATCH_SIZE k sends k rows per LLM call; 1 keeps one call per row
+    k = max(1, plan.settings.batch_size)
+    chunks = [work[start : start + k] for start in range(0, len(work), k)]
+
+    def process(chunk: list[tuple[int, dict, str]]) -> list[dict]:
+        texts = [text for _, _, text in chunk]
+        if len(chunk) == 1:
+            records = [extractor(plan, texts[0])]
+        elif (batch := batch_extractor(plan, texts)) is None:
+            # The endpoint refused the call; per-row retries would be refused too
+            records = [None] * len(chunk)
+        else:
+            # Rows the batch call could not produce are retried on their own
+            records = [
+                record if record is not None else extractor(plan, text)
+                for record, text in zip(batch, texts)
+            ]
+        return [
+            _process_row(row, record, client, route, model, plan)
+            for (_, row, _), record in zip(chunk, records)
+        ]
+
+    def announce(i: int, text: str) -> None:
         print(f"  [{i + 1}/{len(rows)}] EXTRACT: {text[:55]}...")
 
-        record = extractor(plan, text)
-
-        if record:
-            # DRAFT step — second LLM call if configured
-            if plan.draft_prompt:
-                draft_text, resolved_prompt = _draft_llm(
-                    client, headers, model, plan, record
-                )
-                if draft_text:
-                    record[plan.draft_prompt.field_name] = draft_text
-                    record["_draft_prompt"] = resolved_prompt
-                    print(f"           PROMPT: {resolved_prompt[:70]}...")
-                    print(f"           DRAFT: {draft_text[:60]}...")
-
-            # Deterministic flag evaluation — no LLM needed
-            flags = plan.flag_evaluator.evaluate(record)
-            record["_flagged"] = len(flags) > 0
-            record["_flag_reasons"] = flags
-            record["_source"] = row.get(
-                "text", {k: v for k, v in row.items() if not k.startswith("_")}
-            )
-
+    def report(record: dict) -> None:
+        if "_error" in record:
+            print("           FAILED")
+        else:
+            if "_draft_prompt" in record:
+                draft_text = record[plan.draft_prompt.field_name]
+                print(f"           PROMPT: {record['_draft_prompt'][:70]}...")
+                print(f"           DRAFT: {draft_text[:60]}...")
+            flags = record["_flag_reasons"]
             status = "FLAGGED" if flags else "OK"
             flag_info = f" ({', '.join(flags)})" if flags else ""
             print(f"           {status}{flag_info}")
+        write_record(record)
+        results.append(record)
 
-            results.append(record)
-        else:
-            print("           FAILED")
-            results.append(
-                {
-                    "_source": row.get(
-                        "text", {k: v for k, v in row.items() if not k.startswith("_")}
-                    ),
-                    "_error": "extraction failed",
-                }
-            )
-
-    # Write output
+    # Chunks are independent LLM round trips; with SET MAX_CONCURRENCY > 1
+    # they overlap on a thread pool. A single chunk (or worker) runs inline
+    # without one. Results are reported, written and kept in input order.
+    parallel = workers > 1 and len(chunks) > 1
     output_path = Path(base_dir) / plan.output
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2)
+    with (
+        (
+            ThreadPoolExecutor(max_workers=min(workers, len(chunks)))
+            if parallel
+            else contextlib.nullcontext()
+        ) as pool,
+        _record_writer(output_path) as write_record,
+    ):
+        if parallel:
+            for chunk, records in zip(chunks, pool.map(process, chunks)):
+                for (i, _, text), record in zip(chunk, records):
+                    announce(i, text)
+                    report(record)
+        else:
+            # Announce rows before their LLM calls, so retry and HTTP
+            # messages print under the row they belong to
+            for chunk in chunks:
+                if len(chunk) == 1:
+                    announce(chunk[0][0], chunk[0][2])
+                else:
+                    first, last = chunk[0][0] + 1, chunk[-1][0] + 1
+                    print(f"  [{first}-{last}/{len(rows)}] BATCH {len(chunk)} rows")
+                records = process(chunk)
+                for (i, _, text), record in zip(chunk, records):
+                    if len(chunk) > 1:
+                        announce(i, text)
+                    report(record)
 
     print(f"\n  OUTPUT {len(results)} records -> {plan.output}")
     flagged = sum(1 for r in results if r.get("_flagged"))
@@ -107,6 +153,66 @@ def run(plan: ExecutionPlan, base_dir: str = ".") -> list[dict]:
     return results
 
 
+def _process_row(
+    row: dict,
+    record: dict | None,
+    client: httpx.Client,
+    route: _Route,
+    model: str,
+    plan: ExecutionPlan,
+) -> dict:
+    """Draft and flag one extracted row, or record the failed extraction.
+
+    Safe to call from worker threads: the httpx client is shared, and
+    everything else touched here is local to the row.
+    """
+    if not record:
+        return {"_source": _row_source(row), "_error": "extraction failed"}
+
+    # DRAFT step — second LLM call if configured
+    if plan.draft_prompt:
+        draft_text, resolved_prompt = _draft_llm(client, route, model, plan, record)
+        if draft_text:
+            record[plan.draft_prompt.field_name] = draft_text
+            record["_draft_prompt"] = resolved_prompt
+
+    # Deterministic flag evaluation — no LLM needed
+    flags = plan.flag_evaluator.evaluate(record)
+    record["_flagged"] = len(flags) > 0
+    record["_flag_reasons"] = flags
+    record["_source"] = _row_source(row)
+    return record
+
+
+@contextlib.contextmanager
+def _record_writer(path: Path) -> Iterator[Callable[[dict], None]]:
+    """Write output records one at a time as they are produced.
+
+    A .jsonl path gets one compact object per line. Anything else gets an
+    indented UTF-8 JSON array, laid out like json.dump(records, indent=2).
+    The array is closed even if the run stops part way, so the file stays
+    valid JSON with every record finished so far.
+    """
+    jsonl = path.suffix == ".jsonl"
+    count = 0
+    with open(path, "wb") as f:
+
+        def write(record: dict) -> None:
+            nonlocal count
+            if jsonl:
+                f.write(_dumps(record) + b"\n")
+            else:
+                f.write(b",\n  " if count else b"[\n  ")
+                f.write(_dumps(record, indent=True).replace(b"\n", b"\n  "))
+            count += 1
+
+        try:
+            yield write
+        finally:
+            if not jsonl:
+                f.write(b"\n]" if count else b"[]")
+
+
 # ---------------------------------------------------------------------------
 # Source loading — CSV files or folders of text files
 # ---------------------------------------------------------------------------
@@ -124,6 +230,17 @@ def _row_to_text(row: dict) -> str:
     return json.dumps(clean) if clean else ""
 
 
+def _row_source(row: dict) -> str | dict:
+    """The input kept on each output record as _source.
+
+    Unstructured rows keep their text; standard rows keep their public
+    columns. The column dict is only built when there is no 'text'.
+    """
+    if "text" in row:
+        return row["text"]
+    return {k: v for k, v in row.items() if not k.startswith("_")}
+
+
 def _load_source(
     source_path: Path, source_str: str = "", headers: dict | None = None
 ) -> list[dict]:
@@ -142,43 +259,53 @@ def _load_source(
         if resp.status_code != 200:
             print(f"  ERROR: HTTP {resp.status_code} from {source_str}")
             sys.exit(1)
-        data = resp.json()
+        data = _loads(resp.content)
         if isinstance(data, list):
             return data
         return [data]  # single object wrapped in list
 
     # JSON file
     if source_path.suffix == ".json":
-        with open(source_path, encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            return [data]  # single object wrapped in list
+        with open(source_path, "rb") as f:
+            data = _loads(f.read())
+        if isinstance(data, list):
+            return data
+        return [data]  # single object wrapped in list
 
     # Folder of files
     if source_path.is_dir():
-        rows = []
-        for f in sorted(source_path.iterdir()):
-            if f.is_file() and not f.name.startswith("."):
-                if f.suffix == ".json":
-                    # Parse JSON file - could be single object or array
-                    data = json.loads(f.read_text(encoding="utf-8"))
-                    if isinstance(data, list):
-                        rows.extend(data)
-                    else:
-                        rows.append(data)
-                else:
-                    # Treat as unstructured text
-                    text = f.read_text(encoding="utf-8").strip()
-                    if text:
-                        rows.append({"text": text, "_filename": f.name})
-        return rows
+        # scandir hands back file type with each entry — no stat per file
+        with os.scandir(source_path) as it:
+            entries = sorted(
+                (e for e in it if e.is_file() and not e.name.startswith(".")),
+                key=lambda e: e.name,
+            )
+        if not entries:
+            return []
+        # Reads are independent and I/O bound; map() keeps the sorted order
+        with ThreadPoolExecutor(max_workers=min(32, len(entries))) as pool:
+            return [row for rows in pool.map(_read_entry, entries) for row in rows]
 
     # CSV file
     with open(source_path, newline="", encoding="utf-8") as f:
         return list(csv.DictReader(f))
 
 
+def _read_entry(entry: os.DirEntry) -> list[dict]:
+    """Read one file from a folder source into its rows.
+
+    JSON files hold one object or an array of them; any other file is
+    unstructured text and becomes a single row (none if blank).
+    """
+    if entry.name.endswith(".json"):
+        with open(entry.path, "rb") as f:
+            data = _loads(f.read())
+        return data if isinstance(data, list) else [data]
+    with open(entry.path, encoding="utf-8") as f:
+        text = f.read().strip()
+    return [{"text": text, "_filename": entry.name}] if text else []
+
+
 # ---------------------------------------------------------------------------
 # LLM extractor — GitHub Models inference API (OpenAI compatible)
 # ---------------------------------------------------------------------------
@@ -194,37 +321,194 @@ def _apply_settings(body: dict, plan: ExecutionPlan) -> None:
         body["seed"] = plan.settings.seed
 
 
-def _make_llm_extractor(client: httpx.Client, headers: dict, model: str):
-    def _extract_llm(plan: ExecutionPlan, text: str, retries: int = 2) -> dict | None:
+def _dumps(obj: object, indent: bool = False) -> bytes:
+    """Serialize to JSON bytes — orjson when installed, stdlib json otherwise.
+
+    indent gives 2-space indented output with non-ASCII kept as UTF-8,
+    the same from both backends.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+    return json.dumps(obj).encode()
+
+
+def _loads(data: bytes | str) -> object:
+    """Parse JSON — orjson when installed; both accept bytes, no decode step."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _make_client(settings: Settings) -> httpx.Client:
+    """Build the LLM client from SET TIMEOUT / MAX_CONNECTIONS / MAX_KEEPALIVE.
+
+    Pool sizes default to the row concurrency times the endpoint count, so
+    every worker keeps a warm connection to each endpoint it rotates over
+    and never queues for a socket or redoes the TLS handshake.
+    """
+    pool = max(1, settings.max_concurrency) * len(_endpoints(settings))
+    return httpx.Client(
+        timeout=httpx.Timeout(settings.timeout, connect=min(10.0, settings.timeout)),
+        limits=httpx.Limits(
+            max_connections=(
+                pool if settings.max_connections is None else settings.max_connections
+            ),
+            max_keepalive_connections=(
+                pool if settings.max_keepalive is None else settings.max_keepalive
+            ),
+        ),
+    )
+
+
+def _endpoints(settings: Settings) -> list[tuple[str, str]]:
+    """(url, token env var) per LLM endpoint — GitHub Models unless SET ENDPOINT."""
+    return settings.endpoints or [(_GITHUB_MODELS_URL, "GITHUB_TOKEN")]
+
+
+def _origin(url: str) -> str:
+    parsed = httpx.URL(url)
+    return f"{parsed.scheme}://{parsed.netloc.decode()}"
+
+
+# Picks the (url, headers) for the next LLM request
+_Route = Callable[[], tuple[str, Mapping[str, str]]]
+
+
+def _llm_headers(token: str, url: str = _GITHUB_MODELS_URL) -> Mapping[str, str]:
+    """Read-only request headers, shared by every call to one endpoint.
+
+    The GitHub media type is only sent to GitHub Models; other
+    OpenAI-compatible endpoints get plain JSON headers.
+    """
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+    if _origin(url) == _GITHUB_MODELS_ORIGIN:
+        headers["Accept"] = "application/vnd.github+json"
+    return MappingProxyType(headers)
+
+
+def _make_route(settings: Settings) -> _Route:
+    """Round-robin LLM requests over the configured endpoints.
+
+    Headers are built once per endpoint, with the token read from that
+    endpoint's env var. With several SET ENDPOINT lines each provider sees
+    only its share of the rows, so its rate limit stretches further.
+    """
+    routes = [
+        (url, _llm_headers(os.environ.get(token_env, ""), url))
+        for url, token_env in _endpoints(settings)
+    ]
+    if len(routes) == 1:
+        only = routes[0]
+        return lambda: only
+    # next() on a cycle is a single C call, so worker threads can share it
+    return functools.partial(next, itertools.cycle(routes))
+
+
+def _prewarm(client: httpx.Client, origin: str = _GITHUB_MODELS_ORIGIN) -> None:
+    """Open the TLS connection to the models endpoint before the first row.
+
+    The HEAD response itself is ignored; the point is the keepalive
+    connection it leaves in the pool, which the first POST then reuses.
+    Failures are ignored too — the real request will surface them.
+    """
+    try:
+        client.head(origin, timeout=5.0)
+    except httpx.HTTPError:
+        pass
+
+
+def _post_llm(client: httpx.Client, route: _Route, content: bytes) -> httpx.Response:
+    """POST an already-encoded chat completions body to the next endpoint.
+
+    Passing bytes as content= skips httpx's own stdlib json encoding.
+    """
+    url, headers = route()
+    return client.post(url, headers=headers, content=content)
+
+
+# Stand-in for the per-row user message while the request body is serialized
+_USER_SLOT = "\x00aidsl:user\x00"
+
+
+def _body_template(
+    plan: ExecutionPlan, model: str, max_tokens: int, system: str | None = None
+) -> tuple[bytes, bytes]:
+    """Serialize the static part of an extraction request once.
+
+    Returns the JSON bytes before and after the user message. The system
+    prompt (schema description, examples, enum lists) is identical for
+    every row, so only the row text is encoded per request. system
+    overrides the plan's extraction prompt.
+    """
+    body = {"model": model, "max_tokens": max_tokens}
+    _apply_settings(body, plan)
+    if system is None:
+        system = plan.extraction_prompt.system
+    if plan.settings.prompt_cache:
+        # Same system prompt -> same key, so the provider routes every row
+        # of the run to a server that already holds the prefix in KV cache
+        body["prompt_cache_key"] = hashlib.sha256(system.encode()).hexdigest()[:32]
+    body["messages"] = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": _USER_SLOT},
+    ]
+    prefix, _, suffix = _dumps(body).rpartition(_dumps(_USER_SLOT))
+    return prefix, suffix
+
+
+# A reply wrapped in a markdown code block: ```json ... ``` (closing optional;
+# anything a chatty model writes after a closing fence on its own line is dropped)
+_FENCE_RE = re.compile(r"\A```[^\n]*\n(.*?)\s*(?:\n```.*|```\s*)?\Z", re.DOTALL)
+
+
+def _retryable(status_code: int) -> bool:
+    """Rate limits and server errors can clear up; other 4xx won't."""
+    return status_code == 429 or status_code >= 500
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with jitter, so parallel rows don't retry in step."""
+    return min(2**attempt + random.random(), 30.0)
+
+
+def _strip_fences(raw: str) -> str:
+    """Unwrap a markdown code fence the model sometimes adds around JSON."""
+    match = _FENCE_RE.match(raw)
+    return match.group(1).strip() if match else raw
+
+
+def _make_llm_extractor(client: httpx.Client, route: _Route, model: str):
+    template: tuple[ExecutionPlan, bytes, bytes] | None = None
+
+    def _extract_llm(plan: ExecutionPlan, text: str) -> dict | None:
+        nonlocal template
+        if template is None or template[0] is not plan:
+            template = (plan, *_body_template(plan, model, 256))
+        _, prefix, suffix = template
+
+        retries = max(0, plan.settings.max_retries)
         for attempt in range(retries + 1):
             try:
-                body = {
-                    "model": model,
-                    "max_tokens": 256,
-                    "messages": [
-                        {"role": "system", "content": plan.extraction_prompt.system},
-                        {"role": "user", "content": text},
-                    ],
-                }
-                _apply_settings(body, plan)
-                resp = client.post(_GITHUB_MODELS_URL, headers=headers, json=body)
+                resp = _post_llm(client, route, prefix + _dumps(text) + suffix)
 
                 if resp.status_code != 200:
                     print(f"           HTTP {resp.status_code}: {resp.text[:120]}")
-                    if attempt < retries:
-                        time.sleep(2**attempt)
+                    if attempt < retries and _retryable(resp.status_code):
+                        time.sleep(_backoff(attempt))
                         continue
                     return None
 
-                data = resp.json()
+                data = _loads(resp.content)
                 raw = data["choices"][0]["message"]["content"].strip()
 
-                # Strip markdown code fences if present
-                if raw.startswith("```"):
-                    raw = raw.split("\n", 1)[1]
-                    raw = raw.rsplit("```", 1)[0].strip()
+                raw = _strip_fences(raw)
 
-                record = json.loads(raw)
+                record = _loads(raw)
 
                 if _validate(record, plan):
                     return record
@@ -232,6 +516,12 @@ def _make_llm_extractor(client: httpx.Client, headers: dict, model: str):
                 if attempt < retries:
                     print(f"           retry ({attempt + 1}) - validation failed")
 
+            except httpx.TransportError as e:
+                # Timeouts and dropped connections mean a loaded endpoint
+                if attempt < retries:
+                    print(f"           retry ({attempt + 1}) - {e}")
+                    time.sleep(_backoff(attempt))
+
             except Exception as e:
                 if attempt < retries:
                     print(f"           retry ({attempt + 1}) - {e}")
@@ -241,6 +531,90 @@ def _make_llm_extractor(client: httpx.Client, headers: dict, model: str):
     return _extract_llm
 
 
+# Appended to the extraction prompt when several rows share one call
+_BATCH_INSTRUCTIONS = (
+    "\n\nThe input is a JSON array of input texts, one per row. Apply the "
+    "instructions above to each text and return ONLY a JSON array with "
+    "exactly one object per input text, in the same order. "
+    "No markdown, no explanation."
+)
+
+
+def _batch_system(system: str) -> str:
+    """Swap the extraction prompt's single-object instruction for the array one."""
+    lines = [line for line in system.split("\n") if not line.startswith(_RETURN_OBJECT)]
+    return "\n".join(lines).rstrip() + _BATCH_INSTRUCTIONS
+
+
+def _make_batch_extractor(client: httpx.Client, route: _Route, model: str):
+    template: tuple[ExecutionPlan, bytes, bytes] | None = None
+
+    def _extract_batch_llm(
+        plan: ExecutionPlan, texts: list[str]
+    ) -> list[dict | None] | None:
+        """Extract several rows with one call; None marks a row that failed.
+
+        Returns None instead of a list when the endpoint refused the request
+        outright (e.g. 401): retrying the rows one by one would fail the same way.
+        """
+        nonlocal template
+        if template is None or template[0] is not plan:
+            system = _batch_system(plan.extraction_prompt.system)
+            max_tokens = 256 * plan.settings.batch_size
+            template = (plan, *_body_template(plan, model, max_tokens, system))
+        _, prefix, suffix = template
+        # A JSON array keeps row boundaries unambiguous for multi-line texts
+        user = _dumps(texts).decode()
+
+        retries = max(0, plan.settings.max_retries)
+        for attempt in range(retries + 1):
+            try:
+                resp = _post_llm(client, route, prefix + _dumps(user) + suffix)
+
+                if resp.status_code != 200:
+                    print(f"           HTTP {resp.status_code}: {resp.text[:120]}")
+                    if not _retryable(resp.status_code):
+                        return None
+                    if attempt < retries:
+                        time.sleep(_backoff(attempt))
+                        continue
+                    break
+
+                data = _loads(resp.content)
+                raw = data["choices"][0]["message"]["content"].strip()
+
+                raw = _strip_fences(raw)
+
+                records = _loads(raw)
+
+                if (
+                    isinstance(records, list)
+                    and len(records) == len(texts)
+                    and all(isinstance(r, dict) for r in records)
+                ):
+                    valid = _validate_batch(records, plan)
+                    return [r if ok else None for r, ok in zip(records, valid)]
+
+                if attempt < retries:
+                    print(
+                        f"           retry ({attempt + 1}) - expected {len(texts)} rows"
+                    )
+
+            except httpx.TransportError as e:
+                # Timeouts and dropped connections mean a loaded endpoint
+                if attempt < retries:
+                    print(f"           retry ({attempt + 1}) - {e}")
+                    time.sleep(_backoff(attempt))
+
+            except Exception as e:
+                if attempt < retries:
+                    print(f"           retry ({attempt + 1}) - {e}")
+
+        return [None] * len(texts)
+
+    return _extract_batch_llm
+
+
 def _substitute_placeholders(template: str, record: dict) -> str:
     """Replace {field_name} placeholders with values from the record.
 
@@ -256,7 +630,7 @@ def _substitute_placeholders(template: str, record: dict) -> str:
 
 def _draft_llm(
     client: httpx.Client,
-    headers: dict,
+    route: _Route,
     model: str,
     plan: ExecutionPlan,
     record: dict,
@@ -265,13 +639,23 @@ def _draft_llm(
 
     Returns (draft_text, resolved_prompt) — the resolved prompt shows
     the template after {field} substitution for audit/debugging.
+    A fused draft (SET FUSE_DRAFT) already came back with the extraction
+    call, so it is read off the record instead; its template has no
+    placeholders, so the draft template is the resolved prompt.
     """
     draft = plan.draft_prompt
 
+    if draft.fused:
+        value = record.get(draft.field_name)
+        return (
+            (str(value) if value is not None else None),
+            draft.system,
+        )
+
     # Substitute {field} placeholders in the system prompt from the record
     system_prompt = _substitute_placeholders(draft.system, record)
 
-    user_msg = json.dumps(record, indent=2)
+    user_msg = _dumps(record, indent=True).decode()
 
     body = {
         "model": model,
@@ -283,18 +667,16 @@ def _draft_llm(
     }
     _apply_settings(body, plan)
     try:
-        resp = client.post(_GITHUB_MODELS_URL, headers=headers, json=body)
+        resp = _post_llm(client, route, _dumps(body))
         if resp.status_code != 200:
             return None, system_prompt
-        data = resp.json()
+        data = _loads(resp.content)
         raw = data["choices"][0]["message"]["content"].strip()
 
         # Try to parse as JSON and extract the field
-        if raw.startswith("```"):
-            raw = raw.split("\n", 1)[1]
-            raw = raw.rsplit("```", 1)[0].strip()
+        raw = _strip_fences(raw)
         try:
-            parsed = json.loads(raw)
+            parsed = _loads(raw)
             return str(parsed.get(draft.field_name, raw)), system_prompt
         except json.JSONDecodeError:
             # LLM returned plain text — use as-is
@@ -304,18 +686,37 @@ def _draft_llm(
 
 
 def _validate(record: dict, plan: ExecutionPlan) -> bool:
-    """Validate a record using the Pydantic model generated by the compiler.
+    """Validate a record using the validator compiled with the plan.
 
     On success, coerced values (e.g. string -> float) are written back to
     the record dict so downstream code sees clean types.
     """
-    if plan.pydantic_model is None:
+    validator = plan.extraction_prompt.validator
+    if validator is None:
         return True
 
     try:
-        validated = plan.pydantic_model.model_validate(record)
-        # Write coerced values back into the original dict
-        record.update(validated.model_dump())
-        return True
-    except Exception:
+        record.update(validator(record))
+    except pydantic.ValidationError:
         return False
+    return True
+
+
+def _validate_batch(records: list[dict], plan: ExecutionPlan) -> list[bool]:
+    """Validate several records with one pydantic-core call.
+
+    Returns one result per record, like calling _validate on each. If any
+    record in the batch is invalid, falls back to per-record validation
+    so the valid ones are still coerced and kept.
+    """
+    batch_validator = plan.extraction_prompt.batch_validator
+    if batch_validator is None:
+        return [_validate(record, plan) for record in records]
+
+    try:
+        cleaned = batch_validator(records)
+    except pydantic.ValidationError:
+        return [_validate(record, plan) for record in records]
+    for record, values in zip(records, cleaned):
+        record.update(values)
+    return [True] * len(records)
@@ -9,10 +9,14 @@ from aidsl.parser import parse, Program
 from aidsl.compiler import compile_program, ExecutionPlan
 
 
-@pytest.fixture()
-def expense_ai(tmp_path):
-    """Write a standard expense.ai file and return its path."""
-    ai_file = tmp_path / "expense.ai"
+@pytest.fixture(scope="session")
+def expense_ai(tmp_path_factory):
+    """Write a standard expense.ai file and return its path.
+
+    Session-scoped: the file, Program and plan are read-only in tests, so
+    each pytest worker parses and compiles them once.
+    """
+    ai_file = tmp_path_factory.mktemp("expense") / "expense.ai"
     ai_file.write_text(
         textwrap.dedent("""\
         DEFINE expense:
@@ -30,16 +34,16 @@ def expense_ai(tmp_path):
     return ai_file
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def expense_program(expense_ai) -> Program:
     """Parse the standard expense.ai into a Program."""
     return parse(str(expense_ai))
 
 
-@pytest.fixture()
-def expense_plan(expense_program, tmp_path) -> ExecutionPlan:
+@pytest.fixture(scope="session")
+def expense_plan(expense_program, expense_ai) -> ExecutionPlan:
     """Compile the standard expense program into an ExecutionPlan."""
-    return compile_program(expense_program, base_dir=str(tmp_path))
+    return compile_program(expense_program, base_dir=str(expense_ai.parent))
 
 
 @pytest.fixture()
@@ -67,3 +71,61 @@ def make_llm_response(record: dict) -> dict:
             }
         ]
     }
+
+
+class FakeResponse:
+    """Minimal httpx.Response stand-in: a status code and a JSON body."""
+
+    __slots__ = ("content", "status_code")
+
+    def __init__(self, payload: dict, status_code: int = 200) -> None:
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode()
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+
+def mock_post_factory(responses: list[dict]):
+    """Return a fake client.post that replays responses in call order."""
+    call_count = 0
+
+    def mock_post(url, headers=None, content=None):
+        nonlocal call_count
+        resp = FakeResponse(responses[min(call_count, len(responses) - 1)])
+        call_count += 1
+        return resp
+
+    return mock_post
+
+
+class FakeClient:
+    """Plain stand-in for httpx.Client — no MagicMock call recording."""
+
+    def __init__(self, post):
+        self.post = post
+        self.kwargs: dict = {}
+        self.heads: list[str] = []
+
+    def head(self, url, **kwargs):
+        self.heads.append(url)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    """Install a FakeClient whose post() is the given callable."""
+    monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
+    monkeypatch.delenv("AIDSL_MODEL", raising=False)
+
+    def install(post):
+        client = FakeClient(post)
+
+        def factory(**kwargs):
+            client.kwargs = kwargs
+            return client
+
+        monkeypatch.setattr("aidsl.runtime.httpx.Client", factory)
+        return client
+
+    return install
@@ -7,7 +7,7 @@ import pytest
 from aidsl.api import Pipeline, SchemaBuilder
 from aidsl.compiler import compile_program
 
-from tests.conftest import make_llm_response
+from tests.conftest import make_llm_response, mock_post_factory
 
 
 # ---------------------------------------------------------------------------
@@ -231,20 +231,6 @@ def test_nested_schema_round_trip():
 # ---------------------------------------------------------------------------
 
 
-def _mock_post_factory(responses: list[dict]):
-    call_count = 0
-
-    def mock_post(url, headers=None, json=None):
-        nonlocal call_count
-        resp = MagicMock()
-        resp.status_code = 200
-        resp.json.return_value = responses[min(call_count, len(responses) - 1)]
-        call_count += 1
-        return resp
-
-    return mock_post
-
-
 def test_pipeline_run_end_to_end(tmp_path):
     csv_file = tmp_path / "data.csv"
     csv_file.write_text('text\n"Coffee latte, $4.50"\n"Steak dinner, $45.00"\n')
@@ -270,7 +256,7 @@ def test_pipeline_run_end_to_end(tmp_path):
             "fake-token" if k == "GITHUB_TOKEN" else d
         )
         mock_client = MagicMock()
-        mock_client.post = _mock_post_factory(responses)
+        mock_client.post = mock_post_factory(responses)
         mock_client_cls.return_value = mock_client
 
         results = (
@@ -303,13 +289,13 @@ def test_pipeline_run_one_with_mock(tmp_path):
 
     with (
         patch("aidsl.api.os.environ.get") as mock_env,
-        patch("aidsl.api.httpx.Client") as mock_client_cls,
+        patch("aidsl.runtime.httpx.Client") as mock_client_cls,
     ):
         mock_env.side_effect = lambda k, d="": (
             "fake-token" if k == "GITHUB_TOKEN" else d
         )
         mock_client = MagicMock()
-        mock_client.post = _mock_post_factory([response])
+        mock_client.post = mock_post_factory([response])
         mock_client_cls.return_value = mock_client
 
         result = (
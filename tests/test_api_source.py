@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+
 from unittest.mock import MagicMock, patch
 
 from aidsl.runtime import _load_source
@@ -12,10 +14,12 @@ def test_load_api_source_array(tmp_path):
         mock_client = MagicMock()
         mock_resp = MagicMock()
         mock_resp.status_code = 200
-        mock_resp.json.return_value = [
-            {"id": 1, "status": "open"},
-            {"id": 2, "status": "closed"},
-        ]
+        mock_resp.content = json.dumps(
+            [
+                {"id": 1, "status": "open"},
+                {"id": 2, "status": "closed"},
+            ]
+        ).encode()
         mock_client.get.return_value = mock_resp
         mock_client_cls.return_value = mock_client
 
@@ -30,7 +34,7 @@ def test_load_api_source_single_object(tmp_path):
         mock_client = MagicMock()
         mock_resp = MagicMock()
         mock_resp.status_code = 200
-        mock_resp.json.return_value = {"id": 1, "status": "open"}
+        mock_resp.content = json.dumps({"id": 1, "status": "open"}).encode()
         mock_client.get.return_value = mock_resp
         mock_client_cls.return_value = mock_client
 
@@ -45,7 +49,7 @@ def test_load_api_source_with_headers(tmp_path):
         mock_client = MagicMock()
         mock_resp = MagicMock()
         mock_resp.status_code = 200
-        mock_resp.json.return_value = [{"data": "test"}]
+        mock_resp.content = json.dumps([{"data": "test"}]).encode()
         mock_client.get.return_value = mock_resp
         mock_client_cls.return_value = mock_client
 
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+
+from aidsl.parser import parse
+from aidsl.compiler import compile_program
+from aidsl.runtime import run
+
+from tests.conftest import FakeResponse, make_llm_response, mock_post_factory
+
+
+def _make_batch_plan(tmp_path, batch_size: int):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n"
+        "  name TEXT\n"
+        "  price MONEY\n"
+        "\n"
+        f"SET BATCH_SIZE {batch_size}\n"
+        "FROM data.csv\n"
+        "EXTRACT item\n"
+        "FLAG WHEN price OVER 10\n"
+        "OUTPUT result.json\n"
+    )
+    (tmp_path / "data.csv").write_text(
+        'text\n"Coffee, $4.50"\n"Steak, $45.00"\n"Tea, $3.00"\n'
+    )
+    return compile_program(parse(str(ai_file)))
+
+
+def _run_with(tmp_path, plan, fake_client, post):
+    """Run the plan; returns the results and each request's decoded body."""
+    bodies = []
+
+    def recording_post(url, headers=None, content=None):
+        bodies.append(json.loads(content))
+        return post(url, headers=headers, content=content)
+
+    fake_client(recording_post)
+    return run(plan, base_dir=str(tmp_path)), bodies
+
+
+def test_batch_single_call_for_all_rows(tmp_path, fake_client):
+    plan = _make_batch_plan(tmp_path, 3)
+    responses = [
+        make_llm_response(
+            [
+                {"name": "Coffee", "price": 4.50},
+                {"name": "Steak", "price": "45.00"},
+                {"name": "Tea", "price": 3},
+            ]
+        )
+    ]
+
+    results, bodies = _run_with(
+        tmp_path, plan, fake_client, mock_post_factory(responses)
+    )
+
+    assert len(bodies) == 1
+    system, user = (m["content"] for m in bodies[0]["messages"])
+    assert json.loads(user) == ["Coffee, $4.50", "Steak, $45.00", "Tea, $3.00"]
+    assert "JSON array" in system
+    # The single-object instruction would contradict the array one
+    assert "valid JSON object" not in system
+
+    assert [r["name"] for r in results] == ["Coffee", "Steak", "Tea"]
+    assert results[1]["price"] == 45.0
+    assert [r["_flagged"] for r in results] == [False, True, False]
+    assert [r["_source"] for r in results] == [
+        "Coffee, $4.50",
+        "Steak, $45.00",
+        "Tea, $3.00",
+    ]
+
+
+def test_batch_chunks_rows(tmp_path, fake_client):
+    plan = _make_batch_plan(tmp_path, 2)
+    responses = [
+        make_llm_response(
+            [{"name": "Coffee", "price": 4.50}, {"name": "Steak", "price": 45}]
+        ),
+        make_llm_response({"name": "Tea", "price": 3}),
+    ]
+
+    results, bodies = _run_with(
+        tmp_path, plan, fake_client, mock_post_factory(responses)
+    )
+
+    # Two rows in the first call; the odd row out goes alone
+    assert len(bodies) == 2
+    assert [r["name"] for r in results] == ["Coffee", "Steak", "Tea"]
+
+
+def test_batch_invalid_row_retried_alone(tmp_path, fake_client):
+    plan = _make_batch_plan(tmp_path, 3)
+    responses = [
+        make_llm_response(
+            [
+                {"name": "Coffee", "price": 4.50},
+                {"name": "Steak", "price": "a lot"},
+                {"name": "Tea", "price": 3},
+            ]
+        ),
+        make_llm_response({"name": "Steak", "price": 45}),
+    ]
+
+    results, bodies = _run_with(
+        tmp_path, plan, fake_client, mock_post_factory(responses)
+    )
+
+    assert len(bodies) == 2
+    assert bodies[1]["messages"][1]["content"] == "Steak, $45.00"
+    assert [r["name"] for r in results] == ["Coffee", "Steak", "Tea"]
+    assert results[1]["price"] == 45.0
+
+
+def test_batch_multiline_rows_stay_separate(tmp_path, fake_client):
+    plan = _make_batch_plan(tmp_path, 2)
+    (tmp_path / "data.csv").write_text('text\n"Coffee\nRow 2: $4.50"\n"Tea, $3"\n')
+    responses = [
+        make_llm_response(
+            [{"name": "Coffee", "price": 4.50}, {"name": "Tea", "price": 3}]
+        )
+    ]
+
+    results, bodies = _run_with(
+        tmp_path, plan, fake_client, mock_post_factory(responses)
+    )
+
+    user = bodies[0]["messages"][1]["content"]
+    assert json.loads(user) == ["Coffee\nRow 2: $4.50", "Tea, $3"]
+    assert [r["name"] for r in results] == ["Coffee", "Tea"]
+
+
+def test_batch_refused_call_not_retried_per_row(tmp_path, fake_client):
+    plan = _make_batch_plan(tmp_path, 3)
+
+    def refuse(url, headers=None, content=None):
+        return FakeResponse({"error": "bad credentials"}, status_code=401)
+
+    results, bodies = _run_with(tmp_path, plan, fake_client, refuse)
+
+    # One refused batch call; no per-row fallback calls
+    assert len(bodies) == 1
+    assert all("_error" in r for r in results)
@@ -5,7 +5,7 @@ from unittest.mock import MagicMock, patch
 from aidsl.parser import parse
 from aidsl.compiler import compile_program
 from aidsl.runtime import run
-from tests.conftest import make_llm_response
+from tests.conftest import make_llm_response, mock_post_factory
 
 
 def test_parse_classify_basic(tmp_path):
@@ -72,20 +72,6 @@ def test_compile_classify_synthetic_schema(tmp_path):
     assert plan.schema.fields[0].enum_values == ["a", "b", "c"]
 
 
-def _mock_post_factory(responses):
-    call_count = 0
-
-    def mock_post(url, headers=None, json=None):
-        nonlocal call_count
-        resp = MagicMock()
-        resp.status_code = 200
-        resp.json.return_value = responses[min(call_count, len(responses) - 1)]
-        call_count += 1
-        return resp
-
-    return mock_post
-
-
 def test_classify_runtime_pipeline(tmp_path):
     ai = tmp_path / "t.ai"
     ai.write_text(
@@ -111,7 +97,7 @@ def test_classify_runtime_pipeline(tmp_path):
             "fake-token" if k == "GITHUB_TOKEN" else d
         )
         mock_client = MagicMock()
-        mock_client.post = _mock_post_factory(responses)
+        mock_client.post = mock_post_factory(responses)
         mock_client_cls.return_value = mock_client
 
         results = run(plan, base_dir=str(tmp_path))
@@ -143,7 +129,7 @@ def test_classify_rejects_invalid_category(tmp_path):
             "fake-token" if k == "GITHUB_TOKEN" else d
         )
         mock_client = MagicMock()
-        mock_client.post = _mock_post_factory(responses)
+        mock_client.post = mock_post_factory(responses)
         mock_client_cls.return_value = mock_client
 
         results = run(plan, base_dir=str(tmp_path))
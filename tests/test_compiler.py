@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import dataclasses
+
 from aidsl.compiler import compile_program
+from aidsl.parser import FieldDef, Schema
 
 
 def test_compile_generates_system_prompt(expense_program):
@@ -65,3 +68,40 @@ def test_compile_source_and_output(expense_program):
     plan = compile_program(expense_program)
     assert plan.source == "receipts.csv"
     assert plan.output == "expenses.json"
+
+
+def test_compile_builds_validator(expense_program):
+    plan = compile_program(expense_program)
+    validated = plan.extraction_prompt.validator(
+        {"merchant": "Uber", "amount": "47.50", "category": "travel"}
+    )
+    assert validated == {"merchant": "Uber", "amount": 47.5, "category": "travel"}
+
+
+def test_compile_reuses_validators_for_same_schema(expense_program):
+    first = compile_program(expense_program)
+    second = compile_program(expense_program)
+    assert second.extraction_prompt.validator is first.extraction_prompt.validator
+    assert second.pydantic_model is first.pydantic_model
+
+
+def test_compile_rebuilds_validators_for_changed_schema(expense_program):
+    changed = dataclasses.replace(
+        expense_program,
+        schemas={
+            "expense": Schema(
+                "expense",
+                [*expense_program.schemas["expense"].fields, FieldDef("note", "TEXT")],
+            )
+        },
+    )
+    first = compile_program(expense_program)
+    second = compile_program(changed)
+    assert second.extraction_prompt.validator is not first.extraction_prompt.validator
+    assert "note" in second.pydantic_model.model_fields
+
+
+def test_compile_plan_objects_are_slotted(expense_program):
+    plan = compile_program(expense_program)
+    for obj in (plan, plan.extraction_prompt, plan.flag_evaluator, plan.settings):
+        assert not hasattr(obj, "__dict__")
@@ -147,17 +147,23 @@ def test_runtime_draft_appends_field(tmp_path):
     # Mock the httpx responses: first for EXTRACT, second for DRAFT
     extract_resp = MagicMock()
     extract_resp.status_code = 200
-    extract_resp.json.return_value = {
-        "choices": [{"message": {"content": json.dumps({"name": "John Smith"})}}]
-    }
+    extract_resp.content = json.dumps(
+        {"choices": [{"message": {"content": json.dumps({"name": "John Smith"})}}]}
+    ).encode()
 
     draft_resp = MagicMock()
     draft_resp.status_code = 200
-    draft_resp.json.return_value = {
-        "choices": [
-            {"message": {"content": json.dumps({"summary": "Record for John Smith."})}}
-        ]
-    }
+    draft_resp.content = json.dumps(
+        {
+            "choices": [
+                {
+                    "message": {
+                        "content": json.dumps({"summary": "Record for John Smith."})
+                    }
+                }
+            ]
+        }
+    ).encode()
 
     import os
 
@@ -250,21 +256,25 @@ def test_runtime_draft_substitutes_placeholders(tmp_path):
     # Mock LLM: first call = classify, second call = draft
     classify_resp = MagicMock()
     classify_resp.status_code = 200
-    classify_resp.json.return_value = {
-        "choices": [{"message": {"content": json.dumps({"type": "claim"})}}]
-    }
+    classify_resp.content = json.dumps(
+        {"choices": [{"message": {"content": json.dumps({"type": "claim"})}}]}
+    ).encode()
 
     draft_resp = MagicMock()
     draft_resp.status_code = 200
-    draft_resp.json.return_value = {
-        "choices": [
-            {
-                "message": {
-                    "content": json.dumps({"response": "Your claim has been received."})
+    draft_resp.content = json.dumps(
+        {
+            "choices": [
+                {
+                    "message": {
+                        "content": json.dumps(
+                            {"response": "Your claim has been received."}
+                        )
+                    }
                 }
-            }
-        ]
-    }
+            ]
+        }
+    ).encode()
 
     import os
 
@@ -289,7 +299,102 @@ def test_runtime_draft_substitutes_placeholders(tmp_path):
 
     # Verify the second LLM call got the substituted prompt (not raw {type})
     draft_call = mock_client.post.call_args_list[1]
-    draft_body = draft_call[1]["json"]
+    draft_body = json.loads(draft_call[1]["content"])
     system_msg = draft_body["messages"][0]["content"]
     assert "This is a claim ticket" in system_msg
     assert "{type}" not in system_msg
+
+
+# --- SET FUSE_DRAFT: one LLM call for EXTRACT + DRAFT ---
+
+
+def test_compile_fuse_draft_merges_schema(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  name TEXT\n\n"
+        "SET FUSE_DRAFT on\n"
+        "FROM d.csv\nEXTRACT x\nDRAFT summary PROMPT tmpl\nOUTPUT o.json\n"
+    )
+    prompts_dir = tmp_path / "prompts"
+    prompts_dir.mkdir()
+    (prompts_dir / "tmpl.prompt").write_text("Summarize in one sentence.")
+
+    prog = parse(str(ai))
+    plan = compile_program(prog, base_dir=str(tmp_path))
+
+    assert plan.draft_prompt.fused is True
+    schema = plan.extraction_prompt.json_schema
+    assert schema["properties"]["summary"] == {"type": "string"}
+    assert schema["required"] == ["name", "summary"]
+    assert "Summarize in one sentence." in plan.extraction_prompt.system
+    # The draft field sits in the one field list, under one closing instruction
+    system = plan.extraction_prompt.system
+    assert "- summary: text generated from the input" in system
+    assert system.count("Return ONLY") == 1
+    assert system.count("EXACTLY") == 1
+
+
+def test_compile_fuse_draft_skipped_with_placeholders(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  name TEXT\n\n"
+        "SET FUSE_DRAFT on\n"
+        "FROM d.csv\nEXTRACT x\nDRAFT summary PROMPT tmpl\nOUTPUT o.json\n"
+    )
+    prompts_dir = tmp_path / "prompts"
+    prompts_dir.mkdir()
+    (prompts_dir / "tmpl.prompt").write_text("Write a note to {name}.")
+
+    prog = parse(str(ai))
+    plan = compile_program(prog, base_dir=str(tmp_path))
+
+    assert plan.draft_prompt.fused is False
+    assert "summary" not in plan.extraction_prompt.json_schema["properties"]
+
+
+def test_runtime_fused_draft_single_call(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  name TEXT\n\n"
+        "SET FUSE_DRAFT on\n"
+        "FROM d.csv\nEXTRACT x\nDRAFT summary\nOUTPUT o.json\n"
+    )
+    csv_file = tmp_path / "d.csv"
+    csv_file.write_text('text\n"John Smith is a consultant"\n')
+
+    prog = parse(str(ai))
+    plan = compile_program(prog, base_dir=str(tmp_path))
+
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.content = json.dumps(
+        {
+            "choices": [
+                {
+                    "message": {
+                        "content": json.dumps(
+                            {"name": "John Smith", "summary": "A consultant."}
+                        )
+                    }
+                }
+            ]
+        }
+    ).encode()
+
+    import os
+
+    with patch.dict(os.environ, {"GITHUB_TOKEN": "fake-token"}):
+        with patch("httpx.Client") as mock_client_cls:
+            mock_client = MagicMock()
+            mock_client.post.return_value = resp
+            mock_client_cls.return_value = mock_client
+
+            from aidsl.runtime import run
+
+            results = run(plan, base_dir=str(tmp_path))
+
+    assert mock_client.post.call_count == 1
+    assert results[0]["name"] == "John Smith"
+    assert results[0]["summary"] == "A consultant."
+    # Audit trail shows the draft template, not the whole extraction prompt
+    assert results[0]["_draft_prompt"] == plan.draft_prompt.system
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from aidsl.parser import parse
-from aidsl.compiler import compile_program
+from aidsl.compiler import _read_examples, compile_program
 
 
 # --- Parser tests ---
@@ -93,6 +93,27 @@ def test_compile_examples_injects_examples(tmp_path):
     assert "Now process the following input" in plan.extraction_prompt.system
 
 
+def test_compile_examples_file_parsed_once(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  name TEXT\n\nFROM d.csv\nEXTRACT x EXAMPLES shared\nOUTPUT o.json\n"
+    )
+    examples_dir = tmp_path / "examples"
+    examples_dir.mkdir()
+    (examples_dir / "shared.examples").write_text(
+        'INPUT: John Smith invoice\nOUTPUT: {"name": "John Smith"}\n'
+    )
+
+    prog = parse(str(ai))
+    before = _read_examples.cache_info()
+    plans = [compile_program(prog, base_dir=str(tmp_path)) for _ in range(3)]
+    after = _read_examples.cache_info()
+
+    assert after.misses - before.misses == 1
+    assert after.hits - before.hits == 2
+    assert all("John Smith invoice" in p.extraction_prompt.system for p in plans)
+
+
 def test_compile_examples_with_classify(tmp_path):
     ai = tmp_path / "t.ai"
     ai.write_text(
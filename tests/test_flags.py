@@ -74,6 +74,62 @@ def test_flag_or():
     assert ev.evaluate({"amount": 100, "category": "meals"}) == []
 
 
+class _CountingRecord(dict):
+    """Record that counts field lookups, to observe short-circuiting."""
+
+    lookups = 0
+
+    def get(self, key, default=None):
+        self.lookups += 1
+        return super().get(key, default)
+
+
+def test_flag_and_short_circuits():
+    rule = FlagRule(
+        [Condition("category", "IS", "travel"), Condition("amount", "OVER", "200")],
+        ["AND"],
+    )
+    record = _CountingRecord(category="meals", amount=300)
+    assert _evaluator(rule).evaluate(record) == []
+    assert record.lookups == 1
+
+
+def test_flag_or_short_circuits():
+    rule = FlagRule(
+        [Condition("amount", "OVER", "500"), Condition("category", "IS", "travel")],
+        ["OR"],
+    )
+    record = _CountingRecord(amount=600, category="meals")
+    assert len(_evaluator(rule).evaluate(record)) == 1
+    assert record.lookups == 1
+
+
+def test_flag_is_lowers_each_field_once_per_record():
+    ev = _evaluator(
+        FlagRule([Condition("category", "IS", "travel")]),
+        FlagRule([Condition("category", "IS", "meals")]),
+        FlagRule([Condition("category", "IS", "Travel")]),
+    )
+    record = _CountingRecord(category="TRAVEL")
+    assert len(ev.evaluate(record)) == 2
+    assert record.lookups == 1
+
+
+def test_flag_mixed_conjunctions_fold_left():
+    # (IS travel AND OVER 200) OR UNDER 10 — a false AND must not end the rule
+    rule = FlagRule(
+        [
+            Condition("category", "IS", "travel"),
+            Condition("amount", "OVER", "200"),
+            Condition("amount", "UNDER", "10"),
+        ],
+        ["AND", "OR"],
+    )
+    ev = _evaluator(rule)
+    assert len(ev.evaluate({"category": "meals", "amount": 5})) == 1
+    assert ev.evaluate({"category": "meals", "amount": 50}) == []
+
+
 def test_flag_missing_field():
     ev = _evaluator(FlagRule([Condition("amount", "OVER", "500")]))
     assert ev.evaluate({}) == []
@@ -95,3 +151,8 @@ def test_multiple_rules_partial():
     )
     reasons = ev.evaluate({"amount": 600, "category": "meals"})
     assert len(reasons) == 1
+
+
+def test_flag_over_non_numeric_threshold():
+    ev = _evaluator(FlagRule([Condition("amount", "OVER", "lots")]))
+    assert ev.evaluate({"amount": 600}) == []
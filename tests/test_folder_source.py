@@ -5,7 +5,7 @@ from unittest.mock import MagicMock, patch
 
 from aidsl.parser import parse
 from aidsl.compiler import compile_program
-from aidsl.runtime import _load_source, _row_to_text
+from aidsl.runtime import _load_source, _row_source, _row_to_text
 
 
 # --- _load_source unit tests ---
@@ -41,6 +41,15 @@ def test_load_source_folder_sorted(tmp_path):
     assert [r["_filename"] for r in rows] == ["a.txt", "b.txt", "c.txt"]
 
 
+def test_load_source_folder_many_files_keep_order(tmp_path):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    for i in reversed(range(50)):
+        (folder / f"doc{i:02d}.txt").write_text(f"Document {i}")
+    rows = _load_source(folder)
+    assert [r["text"] for r in rows] == [f"Document {i}" for i in range(50)]
+
+
 def test_load_source_folder_mixed_extensions(tmp_path):
     folder = tmp_path / "docs"
     folder.mkdir()
@@ -111,6 +120,14 @@ def test_row_to_text_empty_row():
     assert _row_to_text({}) == ""
 
 
+def test_row_source_text_row():
+    assert _row_source({"text": "Hello", "_filename": "a.txt"}) == "Hello"
+
+
+def test_row_source_skips_internal_fields():
+    assert _row_source({"name": "Bob", "_row": "3"}) == {"name": "Bob"}
+
+
 def test_load_source_standard_csv(tmp_path):
     csv_file = tmp_path / "data.csv"
     csv_file.write_text(
@@ -160,15 +177,15 @@ def test_runtime_folder_source_pipeline(tmp_path):
 
     resp1 = MagicMock()
     resp1.status_code = 200
-    resp1.json.return_value = {
-        "choices": [{"message": {"content": json.dumps({"name": "John Smith"})}}]
-    }
+    resp1.content = json.dumps(
+        {"choices": [{"message": {"content": json.dumps({"name": "John Smith"})}}]}
+    ).encode()
 
     resp2 = MagicMock()
     resp2.status_code = 200
-    resp2.json.return_value = {
-        "choices": [{"message": {"content": json.dumps({"name": "danger"})}}]
-    }
+    resp2.content = json.dumps(
+        {"choices": [{"message": {"content": json.dumps({"name": "danger"})}}]}
+    ).encode()
 
     import os
 
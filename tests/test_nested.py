@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import functools
 import textwrap
 
+import pydantic
 import pytest
 
-from aidsl.parser import parse
+from aidsl.parser import parse, parse_string
 from aidsl.compiler import compile_program
-from aidsl.runtime import _validate
+from aidsl.runtime import _validate, _validate_batch
 
 
 # ---------------------------------------------------------------------------
@@ -14,24 +16,25 @@ from aidsl.runtime import _validate
 # ---------------------------------------------------------------------------
 
 
+_LIST_OF_AI = textwrap.dedent("""\
+    DEFINE line_item:
+      description TEXT
+      quantity    NUMBER
+      unit_price  MONEY
+
+    DEFINE invoice:
+      vendor TEXT
+      items  LIST OF line_item
+
+    FROM invoices/
+    EXTRACT invoice
+    OUTPUT out.json
+""")
+
+
 def test_parse_list_of_type(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE line_item:
-          description TEXT
-          quantity    NUMBER
-          unit_price  MONEY
-
-        DEFINE invoice:
-          vendor TEXT
-          items  LIST OF line_item
-
-        FROM invoices/
-        EXTRACT invoice
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_LIST_OF_AI)
     prog = parse(str(ai))
     schema = prog.schemas["invoice"]
     items_field = schema.fields[1]
@@ -40,24 +43,25 @@ def test_parse_list_of_type(tmp_path):
     assert items_field.ref_type == "line_item"
 
 
+_CUSTOMER_AI = textwrap.dedent("""\
+    DEFINE address:
+      street TEXT
+      city   TEXT
+      zip    TEXT
+
+    DEFINE customer:
+      name    TEXT
+      billing address
+
+    FROM data.csv
+    EXTRACT customer
+    OUTPUT out.json
+""")
+
+
 def test_parse_ref_type(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE address:
-          street TEXT
-          city   TEXT
-          zip    TEXT
-
-        DEFINE customer:
-          name    TEXT
-          billing address
-
-        FROM data.csv
-        EXTRACT customer
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_CUSTOMER_AI)
     prog = parse(str(ai))
     billing_field = prog.schemas["customer"].fields[1]
     assert billing_field.name == "billing"
@@ -65,23 +69,24 @@ def test_parse_ref_type(tmp_path):
     assert billing_field.ref_type == "address"
 
 
+_ORDER_AI = textwrap.dedent("""\
+    DEFINE item:
+      name  TEXT
+      price MONEY
+
+    DEFINE order:
+      customer TEXT
+      items    LIST OF item
+
+    FROM data.csv
+    EXTRACT order
+    OUTPUT out.json
+""")
+
+
 def test_parse_list_of_preserves_child_schema(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE item:
-          name  TEXT
-          price MONEY
-
-        DEFINE order:
-          customer TEXT
-          items    LIST OF item
-
-        FROM data.csv
-        EXTRACT order
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_ORDER_AI)
     prog = parse(str(ai))
     # Child schema should still be parsed independently
     assert "item" in prog.schemas
@@ -95,25 +100,26 @@ def test_parse_list_of_preserves_child_schema(tmp_path):
 # ---------------------------------------------------------------------------
 
 
+_INVOICE_AI = textwrap.dedent("""\
+    DEFINE line_item:
+      description TEXT
+      quantity    NUMBER
+      unit_price  MONEY
+
+    DEFINE invoice:
+      vendor TEXT
+      total  MONEY
+      items  LIST OF line_item
+
+    FROM data.csv
+    EXTRACT invoice
+    OUTPUT out.json
+""")
+
+
 def test_compile_list_of_json_schema(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE line_item:
-          description TEXT
-          quantity    NUMBER
-          unit_price  MONEY
-
-        DEFINE invoice:
-          vendor TEXT
-          total  MONEY
-          items  LIST OF line_item
-
-        FROM data.csv
-        EXTRACT invoice
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_INVOICE_AI)
     prog = parse(str(ai))
     plan = compile_program(prog, base_dir=str(tmp_path))
     props = plan.extraction_prompt.json_schema["properties"]
@@ -134,22 +140,7 @@ def test_compile_list_of_json_schema(tmp_path):
 
 def test_compile_ref_json_schema(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE address:
-          street TEXT
-          city   TEXT
-          zip    TEXT
-
-        DEFINE customer:
-          name    TEXT
-          billing address
-
-        FROM data.csv
-        EXTRACT customer
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_CUSTOMER_AI)
     prog = parse(str(ai))
     plan = compile_program(prog, base_dir=str(tmp_path))
     props = plan.extraction_prompt.json_schema["properties"]
@@ -164,58 +155,61 @@ def test_compile_ref_json_schema(tmp_path):
     assert billing["required"] == ["street", "city", "zip"]
 
 
+_MISSING_LIST_REF_AI = textwrap.dedent("""\
+    DEFINE order:
+      items LIST OF nonexistent
+
+    FROM data.csv
+    EXTRACT order
+    OUTPUT out.json
+""")
+
+
 def test_compile_missing_ref_raises(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE order:
-          items LIST OF nonexistent
-
-        FROM data.csv
-        EXTRACT order
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_MISSING_LIST_REF_AI)
     prog = parse(str(ai))
     with pytest.raises(ValueError, match="Referenced type 'nonexistent' not defined"):
         compile_program(prog, base_dir=str(tmp_path))
 
 
+_MISSING_REF_AI = textwrap.dedent("""\
+    DEFINE customer:
+      name    TEXT
+      billing no_such_type
+
+    FROM data.csv
+    EXTRACT customer
+    OUTPUT out.json
+""")
+
+
 def test_compile_missing_ref_type_raises(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE customer:
-          name    TEXT
-          billing no_such_type
-
-        FROM data.csv
-        EXTRACT customer
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_MISSING_REF_AI)
     prog = parse(str(ai))
     with pytest.raises(ValueError, match="Referenced type 'no_such_type' not defined"):
         compile_program(prog, base_dir=str(tmp_path))
 
 
+_LINE_AMOUNT_AI = textwrap.dedent("""\
+    DEFINE line_item:
+      description TEXT
+      amount      MONEY
+
+    DEFINE invoice:
+      vendor TEXT
+      items  LIST OF line_item
+
+    FROM data.csv
+    EXTRACT invoice
+    OUTPUT out.json
+""")
+
+
 def test_compile_prompt_describes_nested_fields(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE line_item:
-          description TEXT
-          amount      MONEY
-
-        DEFINE invoice:
-          vendor TEXT
-          items  LIST OF line_item
-
-        FROM data.csv
-        EXTRACT invoice
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_LINE_AMOUNT_AI)
     prog = parse(str(ai))
     plan = compile_program(prog, base_dir=str(tmp_path))
     prompt = plan.extraction_prompt.system
@@ -226,21 +220,7 @@ def test_compile_prompt_describes_nested_fields(tmp_path):
 
 def test_compile_required_includes_nested_fields(tmp_path):
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE item:
-          name  TEXT
-          price MONEY
-
-        DEFINE order:
-          customer TEXT
-          items    LIST OF item
-
-        FROM data.csv
-        EXTRACT order
-        OUTPUT out.json
-    """)
-    )
+    ai.write_text(_ORDER_AI)
     prog = parse(str(ai))
     plan = compile_program(prog, base_dir=str(tmp_path))
     required = plan.extraction_prompt.json_schema["required"]
@@ -253,32 +233,17 @@ def test_compile_required_includes_nested_fields(tmp_path):
 # ---------------------------------------------------------------------------
 
 
-def _make_invoice_plan(tmp_path):
-    """Helper to build a plan with LIST OF for validator tests."""
-    ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE line_item:
-          description TEXT
-          quantity    NUMBER
-          unit_price  MONEY
-
-        DEFINE invoice:
-          vendor TEXT
-          total  MONEY
-          items  LIST OF line_item
-
-        FROM data.csv
-        EXTRACT invoice
-        OUTPUT out.json
-    """)
-    )
-    prog = parse(str(ai))
-    return compile_program(prog, base_dir=str(tmp_path))
+@functools.cache
+def _make_invoice_plan():
+    """Helper to build a plan with LIST OF for validator tests.
 
+    Cached: validator tests only read the plan, so it is compiled once.
+    """
+    return compile_program(parse_string(_INVOICE_AI))
 
-def test_validate_nested_list_valid(tmp_path):
-    plan = _make_invoice_plan(tmp_path)
+
+def test_validate_nested_list_valid():
+    plan = _make_invoice_plan()
     record = {
         "vendor": "Acme",
         "total": 1500.00,
@@ -290,8 +255,8 @@ def test_validate_nested_list_valid(tmp_path):
     assert _validate(record, plan) is True
 
 
-def test_validate_nested_list_empty_array(tmp_path):
-    plan = _make_invoice_plan(tmp_path)
+def test_validate_nested_list_empty_array():
+    plan = _make_invoice_plan()
     record = {
         "vendor": "Acme",
         "total": 0,
@@ -300,8 +265,8 @@ def test_validate_nested_list_empty_array(tmp_path):
     assert _validate(record, plan) is True
 
 
-def test_validate_nested_list_not_array(tmp_path):
-    plan = _make_invoice_plan(tmp_path)
+def test_validate_nested_list_not_array():
+    plan = _make_invoice_plan()
     record = {
         "vendor": "Acme",
         "total": 100,
@@ -310,8 +275,8 @@ def test_validate_nested_list_not_array(tmp_path):
     assert _validate(record, plan) is False
 
 
-def test_validate_nested_list_item_missing_field(tmp_path):
-    plan = _make_invoice_plan(tmp_path)
+def test_validate_nested_list_item_missing_field():
+    plan = _make_invoice_plan()
     record = {
         "vendor": "Acme",
         "total": 100,
@@ -322,8 +287,8 @@ def test_validate_nested_list_item_missing_field(tmp_path):
     assert _validate(record, plan) is False
 
 
-def test_validate_nested_list_item_bad_number(tmp_path):
-    plan = _make_invoice_plan(tmp_path)
+def test_validate_nested_list_item_bad_number():
+    plan = _make_invoice_plan()
     record = {
         "vendor": "Acme",
         "total": 100,
@@ -334,8 +299,8 @@ def test_validate_nested_list_item_bad_number(tmp_path):
     assert _validate(record, plan) is False
 
 
-def test_validate_nested_list_item_string_coercion(tmp_path):
-    plan = _make_invoice_plan(tmp_path)
+def test_validate_nested_list_item_string_coercion():
+    plan = _make_invoice_plan()
     record = {
         "vendor": "Acme",
         "total": 100,
@@ -348,30 +313,29 @@ def test_validate_nested_list_item_string_coercion(tmp_path):
     assert record["items"][0]["unit_price"] == 50.0
 
 
-def _make_ref_plan(tmp_path):
+_REF_AI = textwrap.dedent("""\
+    DEFINE address:
+      street TEXT
+      city   TEXT
+
+    DEFINE customer:
+      name    TEXT
+      billing address
+
+    FROM data.csv
+    EXTRACT customer
+    OUTPUT out.json
+""")
+
+
+@functools.cache
+def _make_ref_plan():
     """Helper to build a plan with REF type for validator tests."""
-    ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE address:
-          street TEXT
-          city   TEXT
-
-        DEFINE customer:
-          name    TEXT
-          billing address
-
-        FROM data.csv
-        EXTRACT customer
-        OUTPUT out.json
-    """)
-    )
-    prog = parse(str(ai))
-    return compile_program(prog, base_dir=str(tmp_path))
+    return compile_program(parse_string(_REF_AI))
 
 
-def test_validate_ref_valid(tmp_path):
-    plan = _make_ref_plan(tmp_path)
+def test_validate_ref_valid():
+    plan = _make_ref_plan()
     record = {
         "name": "Alice",
         "billing": {"street": "123 Main", "city": "Springfield"},
@@ -379,8 +343,8 @@ def test_validate_ref_valid(tmp_path):
     assert _validate(record, plan) is True
 
 
-def test_validate_ref_not_object(tmp_path):
-    plan = _make_ref_plan(tmp_path)
+def test_validate_ref_not_object():
+    plan = _make_ref_plan()
     record = {
         "name": "Alice",
         "billing": "123 Main St",
@@ -388,8 +352,8 @@ def test_validate_ref_not_object(tmp_path):
     assert _validate(record, plan) is False
 
 
-def test_validate_ref_missing_nested_field(tmp_path):
-    plan = _make_ref_plan(tmp_path)
+def test_validate_ref_missing_nested_field():
+    plan = _make_ref_plan()
     record = {
         "name": "Alice",
         "billing": {"street": "123 Main"},  # missing city
@@ -397,8 +361,8 @@ def test_validate_ref_missing_nested_field(tmp_path):
     assert _validate(record, plan) is False
 
 
-def test_validate_nested_list_item_not_dict(tmp_path):
-    plan = _make_invoice_plan(tmp_path)
+def test_validate_nested_list_item_not_dict():
+    plan = _make_invoice_plan()
     record = {
         "vendor": "Acme",
         "total": 100,
@@ -407,33 +371,72 @@ def test_validate_nested_list_item_not_dict(tmp_path):
     assert _validate(record, plan) is False
 
 
+def test_validate_nested_list_stops_at_first_bad_item():
+    plan = _make_invoice_plan()
+    record = {
+        "vendor": "Acme",
+        "total": 100,
+        "items": [{"description": "Widget"}] * 50,
+    }
+    with pytest.raises(pydantic.ValidationError) as exc:
+        plan.extraction_prompt.validator(record)
+    assert {e["loc"][:2] for e in exc.value.errors()} == {("items", 0)}
+
+
+def test_validate_batch_coerces_all_records():
+    plan = _make_invoice_plan()
+    records = [
+        {"vendor": "Acme", "total": "10", "items": []},
+        {
+            "vendor": "Beta",
+            "total": 20,
+            "items": [{"description": "Bolt", "quantity": "3", "unit_price": 1}],
+        },
+    ]
+    assert _validate_batch(records, plan) == [True, True]
+    assert records[0]["total"] == 10.0
+    assert records[1]["items"][0]["quantity"] == 3.0
+
+
+def test_validate_batch_isolates_invalid_record():
+    plan = _make_invoice_plan()
+    records = [
+        {"vendor": "Acme", "total": "10", "items": []},
+        {"vendor": "Beta", "total": 20, "items": "not a list"},
+        {"vendor": "Gamma", "total": "30", "items": []},
+    ]
+    assert _validate_batch(records, plan) == [True, False, True]
+    assert records[2]["total"] == 30.0
+
+
 # ---------------------------------------------------------------------------
 # End-to-end: parser → compiler → validate (no LLM)
 # ---------------------------------------------------------------------------
 
 
+_INVOICE_PIPELINE_AI = textwrap.dedent("""\
+    DEFINE line_item:
+      description TEXT
+      quantity    NUMBER
+      unit_price  MONEY
+
+    DEFINE invoice:
+      vendor      TEXT
+      invoice_num TEXT
+      total       MONEY
+      items       LIST OF line_item
+
+    FROM invoices/
+    EXTRACT invoice
+    FLAG WHEN total OVER 1000
+    OUTPUT parsed_invoices.json
+""")
+
+
 def test_nested_list_full_pipeline(tmp_path):
     """Parse .ai with nested types, compile, and validate a mock LLM response."""
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE line_item:
-          description TEXT
-          quantity    NUMBER
-          unit_price  MONEY
-
-        DEFINE invoice:
-          vendor      TEXT
-          invoice_num TEXT
-          total       MONEY
-          items       LIST OF line_item
-
-        FROM invoices/
-        EXTRACT invoice
-        FLAG WHEN total OVER 1000
-        OUTPUT parsed_invoices.json
-    """)
-    )
+    ai.write_text(_INVOICE_PIPELINE_AI)
     prog = parse(str(ai))
     plan = compile_program(prog, base_dir=str(tmp_path))
 
@@ -455,27 +458,28 @@ def test_nested_list_full_pipeline(tmp_path):
     assert "OVER" in flags[0]
 
 
+_CONTACT_AI = textwrap.dedent("""\
+    DEFINE address:
+      street TEXT
+      city   TEXT
+      state  TEXT
+      zip    TEXT
+
+    DEFINE contact:
+      name    TEXT
+      email   TEXT
+      address address
+
+    FROM data.csv
+    EXTRACT contact
+    OUTPUT contacts.json
+""")
+
+
 def test_ref_type_full_pipeline(tmp_path):
     """Parse .ai with type reference, compile, and validate."""
     ai = tmp_path / "t.ai"
-    ai.write_text(
-        textwrap.dedent("""\
-        DEFINE address:
-          street TEXT
-          city   TEXT
-          state  TEXT
-          zip    TEXT
-
-        DEFINE contact:
-          name    TEXT
-          email   TEXT
-          address address
-
-        FROM data.csv
-        EXTRACT contact
-        OUTPUT contacts.json
-    """)
-    )
+    ai.write_text(_CONTACT_AI)
     prog = parse(str(ai))
     plan = compile_program(prog, base_dir=str(tmp_path))
 
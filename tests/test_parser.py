@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import dataclasses
+import os
 
-from aidsl.parser import parse
+import pytest
+
+from aidsl.parser import parse, parse_string
 
 
 def test_parse_define_text_field(tmp_path):
@@ -86,6 +90,28 @@ def test_parse_flag_is(tmp_path):
     assert prog.flags[0].conditions[0].value == "urgent"
 
 
+def test_parse_flag_is_prelowers_value():
+    prog = parse_string(
+        "DEFINE x:\n  t TEXT\n\nFROM d.csv\nEXTRACT x\nFLAG WHEN t IS Urgent\nOUTPUT o.json\n"
+    )
+    cond = prog.flags[0].conditions[0]
+    assert cond.value == "Urgent"
+    assert cond.value_lc == "urgent"
+
+
+def test_parsed_conditions_are_slotted_and_frozen():
+    cond = (
+        parse_string(
+            "DEFINE x:\n  a MONEY\n\nFROM d.csv\nEXTRACT x\nFLAG WHEN a OVER 5\n"
+        )
+        .flags[0]
+        .conditions[0]
+    )
+    assert not hasattr(cond, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cond.value = "6"
+
+
 def test_parse_flag_compound_and(tmp_path):
     ai = tmp_path / "t.ai"
     ai.write_text(
@@ -124,3 +150,36 @@ def test_parse_full_expense(expense_program):
     assert prog.extract_target == "expense"
     assert len(prog.flags) == 2
     assert prog.output == "expenses.json"
+
+
+def test_parse_string_matches_parse(tmp_path):
+    src = "DEFINE thing:\n  name TEXT\n\nFROM x.csv\nEXTRACT thing\nOUTPUT out.json\n"
+    ai = tmp_path / "t.ai"
+    ai.write_text(src)
+    assert parse_string(src) == parse(str(ai))
+
+
+def test_parse_returns_independent_programs(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE thing:\n  name TEXT\n\nSET SEED 1\nFROM x.csv\nEXTRACT thing\n"
+    )
+    first = parse(str(ai))
+    first.settings.seed = 5
+    first.settings.headers["X-Leak"] = "yes"
+    second = parse(str(ai))
+    assert second is not first
+    assert second.settings.seed == 1
+    assert second.settings.headers == {}
+
+
+def test_parse_sees_edited_file(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text("DEFINE thing:\n  name TEXT\n\nFROM x.csv\nEXTRACT thing\n")
+    first = parse(str(ai))
+    ai.write_text("DEFINE thing:\n  name TEXT\n  cost MONEY\n\nFROM x.csv\n")
+    st = ai.stat()
+    os.utime(ai, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = parse(str(ai))
+    assert len(first.schemas["thing"].fields) == 1
+    assert len(second.schemas["thing"].fields) == 2
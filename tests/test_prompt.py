@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import os
+
 from aidsl.parser import parse
-from aidsl.compiler import compile_program
+from aidsl.compiler import _read_prompt, compile_program
 
 
 def test_parse_extract_prompt(tmp_path):
@@ -105,3 +107,41 @@ def test_compile_prompt_missing_file_raises(tmp_path):
     except FileNotFoundError as e:
         assert "nonexistent" in str(e)
         assert "prompts/" in str(e)
+
+
+def test_compile_prompt_file_read_once(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  name TEXT\n\nFROM d.csv\nEXTRACT x PROMPT shared\nOUTPUT o.json\n"
+    )
+    prompts_dir = tmp_path / "prompts"
+    prompts_dir.mkdir()
+    (prompts_dir / "shared.prompt").write_text("Be precise.")
+
+    prog = parse(str(ai))
+    before = _read_prompt.cache_info()
+    for _ in range(100):
+        compile_program(prog, base_dir=str(tmp_path))
+    after = _read_prompt.cache_info()
+
+    assert after.misses - before.misses == 1
+    assert after.hits - before.hits == 99
+
+
+def test_compile_prompt_file_edit_is_picked_up(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  name TEXT\n\nFROM d.csv\nEXTRACT x PROMPT ctx\nOUTPUT o.json\n"
+    )
+    prompt_file = tmp_path / "prompts" / "ctx.prompt"
+    prompt_file.parent.mkdir()
+    prompt_file.write_text("Old context.")
+    prog = parse(str(ai))
+    compile_program(prog, base_dir=str(tmp_path))
+
+    prompt_file.write_text("New context!")
+    st = prompt_file.stat()
+    os.utime(prompt_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    plan = compile_program(prog, base_dir=str(tmp_path))
+
+    assert plan.extraction_prompt.system.startswith("New context!")
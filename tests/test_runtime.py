@@ -1,31 +1,26 @@
 from __future__ import annotations
 
 import json
-from unittest.mock import patch, MagicMock
+import threading
 
-from aidsl.parser import parse
-from aidsl.compiler import compile_program
-from aidsl.runtime import run
-
-from tests.conftest import make_llm_response
-
-
-def _mock_post_factory(responses: list[dict]):
-    """Return a side_effect function that returns mock responses in order."""
-    call_count = 0
+import httpx
+import pytest
 
-    def mock_post(url, headers=None, json=None):
-        nonlocal call_count
-        resp = MagicMock()
-        resp.status_code = 200
-        resp.json.return_value = responses[min(call_count, len(responses) - 1)]
-        call_count += 1
-        return resp
+from aidsl.parser import Settings, parse
+from aidsl.compiler import compile_program
+from aidsl.runtime import (
+    _body_template,
+    _make_route,
+    _prewarm,
+    _record_writer,
+    _strip_fences,
+    run,
+)
 
-    return mock_post
+from tests.conftest import FakeResponse, make_llm_response, mock_post_factory
 
 
-def test_runtime_full_pipeline(tmp_path):
+def test_runtime_full_pipeline(tmp_path, fake_client):
     # Write .ai file
     ai_file = tmp_path / "test.ai"
     ai_file.write_text(
@@ -54,18 +49,8 @@ def test_runtime_full_pipeline(tmp_path):
         make_llm_response({"name": "Outback", "price": 45.00, "type": "food"}),
     ]
 
-    with (
-        patch("aidsl.runtime.os.environ.get") as mock_env,
-        patch("aidsl.runtime.httpx.Client") as mock_client_cls,
-    ):
-        mock_env.side_effect = lambda k, d="": (
-            "fake-token" if k == "GITHUB_TOKEN" else d
-        )
-        mock_client = MagicMock()
-        mock_client.post = _mock_post_factory(responses)
-        mock_client_cls.return_value = mock_client
-
-        results = run(plan, base_dir=str(tmp_path))
+    client = fake_client(mock_post_factory(responses))
+    results = run(plan, base_dir=str(tmp_path))
 
     assert len(results) == 2
 
@@ -84,8 +69,11 @@ def test_runtime_full_pipeline(tmp_path):
     output = json.loads((tmp_path / "result.json").read_text())
     assert len(output) == 2
 
+    # Connection warmed once before the first row
+    assert client.heads == ["https://models.github.ai"]
 
-def test_runtime_invalid_llm_response_fails(tmp_path):
+
+def test_runtime_invalid_llm_response_fails(tmp_path, fake_client):
     ai_file = tmp_path / "test.ai"
     ai_file.write_text(
         "DEFINE item:\n"
@@ -106,24 +94,122 @@ def test_runtime_invalid_llm_response_fails(tmp_path):
     # LLM returns invalid enum value every time
     bad_response = make_llm_response({"name": "X", "type": "INVALID"})
 
-    with (
-        patch("aidsl.runtime.os.environ.get") as mock_env,
-        patch("aidsl.runtime.httpx.Client") as mock_client_cls,
-    ):
-        mock_env.side_effect = lambda k, d="": (
-            "fake-token" if k == "GITHUB_TOKEN" else d
-        )
-        mock_client = MagicMock()
-        mock_client.post = _mock_post_factory([bad_response])
-        mock_client_cls.return_value = mock_client
-
-        results = run(plan, base_dir=str(tmp_path))
+    fake_client(mock_post_factory([bad_response]))
+    results = run(plan, base_dir=str(tmp_path))
 
     assert len(results) == 1
     assert "_error" in results[0]
 
 
-def test_runtime_markdown_fences_stripped(tmp_path):
+def _retry_plan(tmp_path, max_retries: int = 2):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n  name TEXT\n  type ONE OF [a, b]\n\n"
+        f"SET MAX_RETRIES {max_retries}\n"
+        "FROM data.csv\nEXTRACT item\nOUTPUT result.json\n"
+    )
+    (tmp_path / "data.csv").write_text('text\n"something"\n')
+    return compile_program(parse(str(ai_file)))
+
+
+def _replay(responses):
+    """post() returning the given FakeResponses in order, counting calls."""
+    calls = []
+
+    def post(url, headers=None, content=None):
+        calls.append(url)
+        return responses[len(calls) - 1]
+
+    return post, calls
+
+
+def test_runtime_max_retries_zero_fails_fast(tmp_path, fake_client):
+    plan = _retry_plan(tmp_path, max_retries=0)
+    bad = FakeResponse(make_llm_response({"name": "X", "type": "INVALID"}))
+    post, calls = _replay([bad])
+    fake_client(post)
+
+    results = run(plan, base_dir=str(tmp_path))
+
+    assert "_error" in results[0]
+    assert len(calls) == 1
+
+
+def test_runtime_backs_off_on_server_error(tmp_path, fake_client, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("aidsl.runtime.time.sleep", sleeps.append)
+    post, calls = _replay(
+        [
+            FakeResponse({"error": "busy"}, status_code=503),
+            FakeResponse({"error": "slow down"}, status_code=429),
+            FakeResponse(make_llm_response({"name": "X", "type": "a"})),
+        ]
+    )
+    fake_client(post)
+
+    results = run(_retry_plan(tmp_path), base_dir=str(tmp_path))
+
+    assert results[0]["name"] == "X"
+    assert len(calls) == 3
+    # 2**attempt plus up to a second of jitter
+    assert 1 <= sleeps[0] < 2
+    assert 2 <= sleeps[1] < 3
+
+
+def test_runtime_client_error_not_retried(tmp_path, fake_client, monkeypatch):
+    monkeypatch.setattr("aidsl.runtime.time.sleep", lambda s: None)
+    post, calls = _replay([FakeResponse({"error": "bad request"}, status_code=400)])
+    fake_client(post)
+
+    results = run(_retry_plan(tmp_path), base_dir=str(tmp_path))
+
+    assert "_error" in results[0]
+    assert len(calls) == 1
+
+
+def test_runtime_retry_message_under_its_row(tmp_path, fake_client, capsys):
+    plan = _retry_plan(tmp_path)
+    (tmp_path / "data.csv").write_text("text\nfirst\nsecond\n")
+    post, _ = _replay(
+        [
+            FakeResponse(make_llm_response({"name": "A", "type": "a"})),
+            FakeResponse(make_llm_response({"name": "B", "type": "INVALID"})),
+            FakeResponse(make_llm_response({"name": "B", "type": "b"})),
+        ]
+    )
+    fake_client(post)
+
+    run(plan, base_dir=str(tmp_path))
+
+    out = capsys.readouterr().out
+    assert out.index("[1/2]") < out.index("[2/2]") < out.index("retry (1)")
+
+
+def test_runtime_backs_off_on_transport_error(tmp_path, fake_client, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("aidsl.runtime.time.sleep", sleeps.append)
+    replies = iter(
+        [
+            httpx.ReadTimeout("timed out"),
+            FakeResponse(make_llm_response({"name": "X", "type": "a"})),
+        ]
+    )
+
+    def post(url, headers=None, content=None):
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    fake_client(post)
+
+    results = run(_retry_plan(tmp_path), base_dir=str(tmp_path))
+
+    assert results[0]["name"] == "X"
+    assert len(sleeps) == 1 and 1 <= sleeps[0] < 2
+
+
+def test_runtime_markdown_fences_stripped(tmp_path, fake_client):
     ai_file = tmp_path / "test.ai"
     ai_file.write_text(
         "DEFINE item:\n  name TEXT\n\nFROM data.csv\nEXTRACT item\nOUTPUT result.json\n"
@@ -147,17 +233,243 @@ def test_runtime_markdown_fences_stripped(tmp_path):
         ]
     }
 
-    with (
-        patch("aidsl.runtime.os.environ.get") as mock_env,
-        patch("aidsl.runtime.httpx.Client") as mock_client_cls,
-    ):
-        mock_env.side_effect = lambda k, d="": (
-            "fake-token" if k == "GITHUB_TOKEN" else d
-        )
-        mock_client = MagicMock()
-        mock_client.post = _mock_post_factory([fenced])
-        mock_client_cls.return_value = mock_client
-
-        results = run(plan, base_dir=str(tmp_path))
+    fake_client(mock_post_factory([fenced]))
+    results = run(plan, base_dir=str(tmp_path))
 
     assert results[0]["name"] == "Test"
+
+
+def test_prewarm_ignores_connection_errors():
+    class _OfflineClient:
+        def head(self, url, **kwargs):
+            raise httpx.ConnectError("offline")
+
+    _prewarm(_OfflineClient())  # must not raise
+
+
+def test_runtime_prewarm_off(tmp_path, fake_client):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n  name TEXT\n\nSET PREWARM off\nFROM data.csv\n"
+        "EXTRACT item\nOUTPUT result.json\n"
+    )
+    (tmp_path / "data.csv").write_text('text\n"something"\n')
+    plan = compile_program(parse(str(ai_file)))
+
+    client = fake_client(mock_post_factory([make_llm_response({"name": "x"})]))
+    run(plan, base_dir=str(tmp_path))
+
+    assert client.heads == []
+
+
+def test_runtime_round_robins_endpoints(tmp_path, fake_client, monkeypatch):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n  name TEXT\n\n"
+        "SET ENDPOINT https://a.example/v1/chat/completions A_TOKEN\n"
+        "SET ENDPOINT https://b.example/v1/chat/completions B_TOKEN\n"
+        "FROM data.csv\nEXTRACT item\nOUTPUT result.json\n"
+    )
+    (tmp_path / "data.csv").write_text("text\none\ntwo\nthree\n")
+    plan = compile_program(parse(str(ai_file)))
+    monkeypatch.setenv("A_TOKEN", "token-a")
+    monkeypatch.setenv("B_TOKEN", "token-b")
+
+    calls = []
+
+    def post(url, headers=None, content=None):
+        assert "Accept" not in headers  # GitHub media type only goes to GitHub
+        calls.append((url, headers["Authorization"]))
+        return FakeResponse(make_llm_response({"name": "x"}))
+
+    client = fake_client(post)
+    results = run(plan, base_dir=str(tmp_path))
+
+    assert len(results) == 3
+    assert calls == [
+        ("https://a.example/v1/chat/completions", "Bearer token-a"),
+        ("https://b.example/v1/chat/completions", "Bearer token-b"),
+        ("https://a.example/v1/chat/completions", "Bearer token-a"),
+    ]
+    assert client.heads == ["https://a.example", "https://b.example"]
+
+
+def test_route_reuses_read_only_headers(monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "fake-token")
+    route = _make_route(Settings())
+
+    url, headers = route()
+    assert url == "https://models.github.ai/inference/chat/completions"
+    assert headers["Authorization"] == "Bearer fake-token"
+    assert headers["Accept"] == "application/vnd.github+json"
+    assert route()[1] is headers  # built once, not per request
+    with pytest.raises(TypeError):
+        headers["Authorization"] = "Bearer other"  # type: ignore[index]
+
+
+def test_runtime_endpoint_token_env_required(tmp_path, fake_client):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n  name TEXT\n\n"
+        "SET ENDPOINT https://a.example/v1/chat/completions UNSET_TOKEN_ENV\n"
+        "FROM data.csv\nEXTRACT item\nOUTPUT result.json\n"
+    )
+    (tmp_path / "data.csv").write_text("text\none\n")
+    plan = compile_program(parse(str(ai_file)))
+    fake_client(mock_post_factory([]))
+
+    with pytest.raises(SystemExit):
+        run(plan, base_dir=str(tmp_path))
+
+
+def test_runtime_parallel_calls(tmp_path, fake_client):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n"
+        "  name TEXT\n"
+        "\n"
+        "SET MAX_CONCURRENCY 3\n"
+        "FROM data.csv\n"
+        "EXTRACT item\n"
+        "OUTPUT result.json\n"
+    )
+    (tmp_path / "data.csv").write_text("text\nalpha\nbravo\ncharlie\n")
+    plan = compile_program(parse(str(ai_file)))
+
+    # Every call blocks until all three are in flight — deadlocks (and the
+    # barrier times out) if rows are processed one at a time.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def mock_post(url, headers=None, content=None):
+        barrier.wait()
+        text = json.loads(content)["messages"][1]["content"]
+        return FakeResponse(make_llm_response({"name": text.upper()}))
+
+    client = fake_client(mock_post)
+    results = run(plan, base_dir=str(tmp_path))
+
+    assert [r["name"] for r in results] == ["ALPHA", "BRAVO", "CHARLIE"]
+    assert [r["_source"] for r in results] == ["alpha", "bravo", "charlie"]
+    limits = client.kwargs["limits"]
+    assert limits.max_connections == 3
+    assert limits.max_keepalive_connections == 3
+
+
+def test_runtime_single_row_skips_thread_pool(tmp_path, fake_client, monkeypatch):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n  name TEXT\n\nSET MAX_CONCURRENCY 8\n"
+        "FROM data.csv\nEXTRACT item\nOUTPUT result.json\n"
+    )
+    (tmp_path / "data.csv").write_text("text\nalpha\n")
+    plan = compile_program(parse(str(ai_file)))
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("thread pool started for a single row")
+
+    monkeypatch.setattr("aidsl.runtime.ThreadPoolExecutor", no_pool)
+    fake_client(mock_post_factory([make_llm_response({"name": "Alpha"})]))
+
+    results = run(plan, base_dir=str(tmp_path))
+
+    assert [r["name"] for r in results] == ["Alpha"]
+
+
+def test_body_template_splices_user_text(tmp_path):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n  name TEXT\n\nSET SEED 7\n"
+        "FROM data.csv\nEXTRACT item\nOUTPUT result.json\n"
+    )
+    plan = compile_program(parse(str(ai_file)))
+
+    prefix, suffix = _body_template(plan, "m", 256)
+    text = 'He said "hi"\n\tand left'
+    body = json.loads(prefix + json.dumps(text).encode() + suffix)
+
+    assert body == {
+        "model": "m",
+        "max_tokens": 256,
+        "seed": 7,
+        "messages": [
+            {"role": "system", "content": plan.extraction_prompt.system},
+            {"role": "user", "content": text},
+        ],
+    }
+
+
+def test_body_template_prompt_cache_key(tmp_path):
+    ai_file = tmp_path / "test.ai"
+    ai_file.write_text(
+        "DEFINE item:\n  name TEXT\n\nSET PROMPT_CACHE on\n"
+        "FROM data.csv\nEXTRACT item\nOUTPUT result.json\n"
+    )
+    plan = compile_program(parse(str(ai_file)))
+
+    def cache_key(system=None):
+        prefix, suffix = _body_template(plan, "m", 256, system)
+        return json.loads(prefix + b'"row"' + suffix)["prompt_cache_key"]
+
+    # Stable for a system prompt, different once the prompt changes
+    assert cache_key() == cache_key()
+    assert cache_key() != cache_key("another prompt")
+
+
+def test_body_template_no_prompt_cache_key_by_default(expense_plan):
+    prefix, suffix = _body_template(expense_plan, "m", 256)
+    assert "prompt_cache_key" not in json.loads(prefix + b'"row"' + suffix)
+
+
+_RECORDS = [
+    {"name": "Café", "tags": ["a", "b"], "_flagged": False},
+    {"name": "Steak", "nested": {"price": 45.0}, "_flag_reasons": []},
+]
+
+
+def test_record_writer_matches_json_dump(tmp_path):
+    out = tmp_path / "out.json"
+    with _record_writer(out) as write:
+        for record in _RECORDS:
+            write(record)
+    assert out.read_text(encoding="utf-8") == json.dumps(
+        _RECORDS, indent=2, ensure_ascii=False
+    )
+
+
+def test_record_writer_empty_array(tmp_path):
+    out = tmp_path / "out.json"
+    with _record_writer(out):
+        pass
+    assert out.read_text() == "[]"
+
+
+def test_record_writer_jsonl(tmp_path):
+    out = tmp_path / "out.jsonl"
+    with _record_writer(out) as write:
+        for record in _RECORDS:
+            write(record)
+    lines = out.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == _RECORDS
+
+
+def test_record_writer_keeps_finished_records_on_error(tmp_path):
+    out = tmp_path / "out.json"
+    try:
+        with _record_writer(out) as write:
+            write(_RECORDS[0])
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+    assert json.loads(out.read_text()) == _RECORDS[:1]
+
+
+def test_strip_fences():
+    assert _strip_fences('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert _strip_fences('```\n[{"a": 1}]\n```') == '[{"a": 1}]'
+    assert _strip_fences('```json\n{"a": 1}') == '{"a": 1}'
+    assert _strip_fences('```json\n{"a": "```"}\n```') == '{"a": "```"}'
+    assert _strip_fences('{"a": 1}') == '{"a": 1}'
+    # Chatty models add a sign-off after the closing fence
+    reply = '```json\n{"a": 1}\n```\nHope this helps!'
+    assert _strip_fences(reply) == '{"a": 1}'
+    assert _strip_fences('```json\n{"a": 1}```') == '{"a": 1}'
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import textwrap
+from unittest.mock import patch
+
+import httpx
 
 from aidsl.parser import Settings, parse
 from aidsl.compiler import compile_program
-from aidsl.runtime import _apply_settings
+from aidsl.runtime import _apply_settings, _make_client
 
 
 # ---------------------------------------------------------------------------
@@ -48,6 +51,117 @@ def test_parse_set_seed(tmp_path):
     assert prog.settings.seed == 42
 
 
+def test_parse_set_fuse_draft(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  a TEXT\n\nSET FUSE_DRAFT on\nFROM d.csv\nEXTRACT x\nOUTPUT o.json\n"
+    )
+    prog = parse(str(ai))
+    assert prog.settings.fuse_draft is True
+
+
+def test_parse_set_max_concurrency(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  a TEXT\n\nSET MAX_CONCURRENCY 4\nFROM d.csv\nEXTRACT x\nOUTPUT o.json\n"
+    )
+    prog = parse(str(ai))
+    assert prog.settings.max_concurrency == 4
+
+
+def test_parse_set_batch_size(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  a TEXT\n\nSET BATCH_SIZE 10\nFROM d.csv\nEXTRACT x\nOUTPUT o.json\n"
+    )
+    prog = parse(str(ai))
+    assert prog.settings.batch_size == 10
+
+
+def test_parse_set_connection_settings(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  a TEXT\n\nSET TIMEOUT 45\nSET MAX_CONNECTIONS 16\n"
+        "SET MAX_KEEPALIVE 8\nFROM d.csv\nEXTRACT x\nOUTPUT o.json\n"
+    )
+    prog = parse(str(ai))
+    assert prog.settings.timeout == 45.0
+    assert prog.settings.max_connections == 16
+    assert prog.settings.max_keepalive == 8
+    assert prog.settings.prewarm is True
+    assert prog.settings.max_retries == 2
+
+
+def test_parse_set_prewarm_off(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  a TEXT\n\nSET PREWARM off\nFROM d.csv\nEXTRACT x\nOUTPUT o.json\n"
+    )
+    assert parse(str(ai)).settings.prewarm is False
+
+
+def test_parse_set_endpoints(tmp_path):
+    ai = tmp_path / "t.ai"
+    ai.write_text(
+        "DEFINE x:\n  a TEXT\n\n"
+        "SET ENDPOINT https://a.example/v1/chat/completions A_TOKEN\n"
+        "SET ENDPOINT https://models.github.ai/inference/chat/completions\n"
+        "FROM d.csv\nEXTRACT x\nOUTPUT o.json\n"
+    )
+    assert parse(str(ai)).settings.endpoints == [
+        ("https://a.example/v1/chat/completions", "A_TOKEN"),
+        ("https://models.github.ai/inference/chat/completions", "GITHUB_TOKEN"),
+    ]
+
+
+def test_make_client_pool_defaults_to_concurrency():
+    with patch("aidsl.runtime.httpx.Client") as mock_client_cls:
+        _make_client(Settings(max_concurrency=6))
+    kwargs = mock_client_cls.call_args.kwargs
+    assert kwargs["limits"].max_connections == 6
+    assert kwargs["limits"].max_keepalive_connections == 6
+    assert kwargs["timeout"] == httpx.Timeout(30.0, connect=10.0)
+
+
+def test_make_client_pool_covers_every_endpoint():
+    settings = Settings(
+        max_concurrency=3,
+        endpoints=[
+            ("https://a.example/v1/chat/completions", "A_TOKEN"),
+            ("https://b.example/v1/chat/completions", "B_TOKEN"),
+        ],
+    )
+    with patch("aidsl.runtime.httpx.Client") as mock_client_cls:
+        _make_client(settings)
+    kwargs = mock_client_cls.call_args.kwargs
+    # Idle connections to one host must not be evicted by calls to the other
+    assert kwargs["limits"].max_connections == 6
+    assert kwargs["limits"].max_keepalive_connections == 6
+
+
+def test_make_client_short_timeout_caps_connect():
+    with patch("aidsl.runtime.httpx.Client") as mock_client_cls:
+        _make_client(Settings(timeout=5.0))
+    assert mock_client_cls.call_args.kwargs["timeout"] == httpx.Timeout(5.0)
+
+
+def test_make_client_keepalive_zero_is_respected():
+    with patch("aidsl.runtime.httpx.Client") as mock_client_cls:
+        _make_client(Settings(max_concurrency=4, max_keepalive=0))
+    limits = mock_client_cls.call_args.kwargs["limits"]
+    assert limits.max_keepalive_connections == 0
+    assert limits.max_connections == 4
+
+
+def test_make_client_explicit_limits():
+    with patch("aidsl.runtime.httpx.Client") as mock_client_cls:
+        _make_client(Settings(max_connections=16, max_keepalive=4, timeout=90.0))
+    kwargs = mock_client_cls.call_args.kwargs
+    assert kwargs["limits"].max_connections == 16
+    assert kwargs["limits"].max_keepalive_connections == 4
+    assert kwargs["timeout"] == httpx.Timeout(90.0, connect=10.0)
+
+
 def test_parse_set_multiple(tmp_path):
     ai = tmp_path / "t.ai"
     ai.write_text(
@@ -78,6 +192,8 @@ def test_parse_no_set_defaults(tmp_path):
     assert prog.settings.temperature is None
     assert prog.settings.top_p is None
     assert prog.settings.seed is None
+    assert prog.settings.fuse_draft is False
+    assert prog.settings.max_concurrency == 1
 
 
 # ---------------------------------------------------------------------------